@@ -1,11 +1,20 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import gzip
+import http.client
+import json
 import os
 import struct
+import time
+import urllib.error
 import urllib.request
 
 import numpy as np
 
+from file_utils import sha256_file
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+from mnist_data import DEFAULT_SHARD_SIZE, load_images, write_shards
+
 URL_BASES = [
     "http://yann.lecun.com/exdb/mnist/",
     "https://storage.googleapis.com/cvdf-datasets/mnist/",
@@ -16,47 +25,165 @@ FILES = {
     "test_images": "t10k-images-idx3-ubyte.gz",
     "test_labels": "t10k-labels-idx1-ubyte.gz",
 }
+# SHA-256 of each archive (same values TensorFlow Datasets pins).
+MANIFEST = {
+    "train-images-idx3-ubyte.gz": "440fcabf73cc546fa21475e81ea370265605f56be210a4024d2ca8f203523609",
+    "train-labels-idx1-ubyte.gz": "3552534a0a558bbed6aed32b30c495cca23d567ec52cac8be1a0730e8010255c",
+    "t10k-images-idx3-ubyte.gz": "8d422c7b0a1c1c79245a5bcf07fe86e33eeafee792b84584aec276f5a2dbc4e6",
+    "t10k-labels-idx1-ubyte.gz": "f7ae60f92e00ec6debd23a6088c31dbd2371eca3ffa0defaefb259924204aec6",
+}
+CHUNK_SIZE = 1 << 20
+
+
+def _rank_mirrors(bases: list[str], probe: str, timeout: float) -> list[str]:
+    """Order mirrors by how fast they answer a HEAD for ``probe``.
 
+    The probes race each other in a thread pool; ones that fail keep their
+    original relative order at the end, so they are still tried as a last
+    resort. Only the download itself is sequential: racing whole archives
+    would fetch every byte once per mirror.
+    """
+    def probe_one(base: str) -> float:
+        start = time.monotonic()
+        try:
+            req = urllib.request.Request(base + probe, method="HEAD")
+            with urllib.request.urlopen(req, timeout=timeout):
+                pass
+        except (OSError, ValueError, http.client.HTTPException):
+            return float("inf")
+        return time.monotonic() - start
+
+    if len(bases) < 2:
+        return list(bases)
+    with ThreadPoolExecutor(max_workers=len(bases)) as pool:
+        latencies = list(pool.map(probe_one, bases))
+    order = sorted(range(len(bases)), key=lambda i: (latencies[i], i))
+    return [bases[i] for i in order]
 
-def _download(urls: list[str], dest: str) -> None:
+
+def _fetch(url: str, tmp: str, timeout: float) -> None:
+    """Download ``url`` into ``tmp``, resuming from its current size."""
+    offset = os.path.getsize(tmp) if os.path.exists(tmp) else 0
+    req = urllib.request.Request(url)
+    if offset:
+        req.add_header("Range", f"bytes={offset}-")
+    try:
+        resp = urllib.request.urlopen(req, timeout=timeout)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 416 and offset:
+            # Already have every byte; the checksum decides if it is right.
+            return
+        raise
+    with resp:
+        # A 200 means the server ignored the Range header: start over.
+        mode = "ab" if resp.status == 206 else "wb"
+        expected = resp.headers.get("Content-Length")
+        received = 0
+        with open(tmp, mode) as out:
+            for chunk in iter(lambda: resp.read(CHUNK_SIZE), b""):
+                out.write(chunk)
+                received += len(chunk)
+    # http.client treats a connection closed early as a normal end of body.
+    if expected is not None and received < int(expected):
+        raise http.client.IncompleteRead(b"", int(expected) - received)
+
+
+def _download(urls: list[str], dest: str, sha256: str | None, timeout: float = 60.0) -> None:
     if os.path.exists(dest):
-        return
+        if sha256 is None or sha256_file(dest) == sha256:
+            return
+        os.remove(dest)
     os.makedirs(os.path.dirname(dest), exist_ok=True)
     tmp = dest + ".tmp"
     last_err = None
     for url in urls:
         try:
-            urllib.request.urlretrieve(url, tmp)
-            os.replace(tmp, dest)
-            return
-        except Exception as exc:  # noqa: BLE001
+            _fetch(url, tmp, timeout)
+        except (OSError, ValueError, http.client.HTTPException) as exc:
+            # Keep the partial file (e.g. after an IncompleteRead): the next
+            # mirror resumes from it with a Range request.
             last_err = exc
-            if os.path.exists(tmp):
-                try:
-                    os.remove(tmp)
-                except OSError:
-                    pass
+            continue
+        if sha256 is not None and sha256_file(tmp) != sha256:
+            last_err = ValueError(f"SHA-256 mismatch for {url}")
+            os.remove(tmp)
+            continue
+        os.replace(tmp, dest)
+        return
     raise RuntimeError(f"Failed to download {dest} from known MNIST mirrors") from last_err
 
 
-def _read_images(path: str) -> np.ndarray:
+def _read_exact(f, view: memoryview, path: str) -> None:
+    while view.nbytes:
+        n = f.readinto(view)
+        if not n:
+            raise ValueError(f"Truncated IDX file {path}")
+        view = view[n:]
+
+
+def _read_header(f, path: str, expected_magic: int, ndim: int) -> tuple[int, ...]:
+    magic, *dims = struct.unpack(f">I{ndim}I", f.read(4 + 4 * ndim))
+    if magic != expected_magic:
+        raise ValueError(f"Unexpected magic number {magic} in {path}")
+    return tuple(dims)
+
+
+def _normalize_into(out: np.ndarray, pixels: np.ndarray) -> None:
+    # Same float32 result as pixels.astype(np.float32) / 255.0, without
+    # the temporaries.
+    out[...] = pixels
+    np.divide(out, 255.0, out=out)
+
+
+def _open_output(path: str, dtype, shape: tuple[int, ...]) -> np.ndarray:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def _decode_images(path: str, out_path: str, normalize: bool, chunk_rows: int) -> np.ndarray:
+    """Stream an IDX image file into a new .npy memmap, ``chunk_rows`` at a time.
+
+    With ``normalize`` the output is float32 in [0, 1], otherwise the raw
+    uint8 pixels. Only one chunk of decompressed pixels is held in memory.
+    """
     with gzip.open(path, "rb") as f:
-        magic, count, rows, cols = struct.unpack(">IIII", f.read(16)
-        )
-        if magic != 2051:
-            raise ValueError(f"Unexpected magic number {magic} in {path}")
-        data = np.frombuffer(f.read(), dtype=np.uint8)
-    return data.reshape(count, rows * cols)
+        count, rows, cols = _read_header(f, path, 2051, 3)
+        dtype = np.float32 if normalize else np.uint8
+        out = _open_output(out_path, dtype, (count, rows * cols))
+        buf = np.empty((min(chunk_rows, count), rows * cols), dtype=np.uint8)
+        for start in range(0, count, chunk_rows):
+            chunk = buf[: min(chunk_rows, count - start)]
+            _read_exact(f, memoryview(chunk.reshape(-1)), path)
+            if normalize:
+                _normalize_into(out[start : start + len(chunk)], chunk)
+            else:
+                out[start : start + len(chunk)] = chunk
+    out.flush()
+    return out
 
 
 def _read_labels(path: str) -> np.ndarray:
     with gzip.open(path, "rb") as f:
-        magic, count = struct.unpack(">II", f.read(8)
-        )
-        if magic != 2049:
-            raise ValueError(f"Unexpected magic number {magic} in {path}")
-        data = np.frombuffer(f.read(), dtype=np.uint8)
-    return data.reshape(count)
+        (count,) = _read_header(f, path, 2049, 1)
+        data = np.empty(count, dtype=np.uint8)
+        _read_exact(f, memoryview(data), path)
+    return data
+
+
+def _write_rows(
+    path: str, src: np.ndarray, idx: np.ndarray, normalize: bool, chunk_rows: int
+) -> None:
+    """Write ``src[idx]`` to ``path`` one chunk of rows at a time."""
+    dtype = np.float32 if normalize else src.dtype
+    out = _open_output(path, dtype, (len(idx), src.shape[1]))
+    for start in range(0, len(idx), chunk_rows):
+        stop = start + chunk_rows
+        if normalize:
+            _normalize_into(out[start:stop], src[idx[start:stop]])
+        else:
+            out[start:stop] = src[idx[start:stop]]
+    out.flush()
+    del out
 
 
 def _write_array(path: str, array: np.ndarray) -> None:
@@ -75,43 +202,113 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--y-test", required=True)
     parser.add_argument("--val-split", type=float, default=0.1)
     parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--mirror",
+        action="append",
+        default=None,
+        help="Base URL to fetch the archives from (repeatable; replaces the defaults)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="JSON file mapping archive name to SHA-256 (overrides the built-in one)",
+    )
+    parser.add_argument("--jobs", type=int, default=len(FILES), help="Parallel downloads")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=8192,
+        help="Images decoded and normalized per step; bounds peak memory",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=["float32", "uint8"],
+        default="float32",
+        help="Image dtype on disk; uint8 keeps raw pixels (see mnist_data.load_images)",
+    )
+    parser.add_argument(
+        "--shard-dir",
+        default=None,
+        help="Also write each split as shards under DIR/{train,val,test} (see mnist_data)",
+    )
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    add_instrumentation_arguments(parser)
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    run = RunTimer(args, args.x_train)
     os.makedirs(args.cache_dir, exist_ok=True)
 
-    paths = {}
-    for key, filename in FILES.items():
-        dest = os.path.join(args.cache_dir, filename)
-        urls = [base + filename for base in URL_BASES]
-        _download(urls, dest)
-        paths[key] = dest
+    manifest = MANIFEST
+    if args.manifest:
+        with open(args.manifest, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    bases = args.mirror or URL_BASES
+    bases = [base if base.endswith("/") else base + "/" for base in bases]
+
+    paths = {key: os.path.join(args.cache_dir, filename) for key, filename in FILES.items()}
+
+    def fetch(key: str) -> None:
+        filename = FILES[key]
+        urls = [base + filename for base in bases]
+        _download(urls, paths[key], manifest.get(filename), args.timeout)
+
+    with run.stage("download"):
+        missing = [key for key, dest in paths.items() if not os.path.exists(dest)]
+        if missing:
+            bases = _rank_mirrors(bases, FILES["test_labels"], min(args.timeout, 10.0))
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            # list() re-raises the first download failure.
+            list(pool.map(fetch, FILES))
 
-    X_train_full = _read_images(paths["train_images"]).astype(np.float32) / 255.0
     y_train_full = _read_labels(paths["train_labels"]).astype(np.int64)
-    X_test = _read_images(paths["test_images"]).astype(np.float32) / 255.0
     y_test = _read_labels(paths["test_labels"]).astype(np.int64)
+    normalize = args.storage == "float32"
+    with run.stage("decode_test"):
+        _decode_images(paths["test_images"], args.x_test, normalize, args.chunk_rows)
 
     rng = np.random.default_rng(args.seed)
-    indices = rng.permutation(X_train_full.shape[0])
-    val_size = int(args.val_split * X_train_full.shape[0])
+    indices = rng.permutation(y_train_full.shape[0])
+    val_size = int(args.val_split * y_train_full.shape[0])
     val_idx = indices[:val_size]
     train_idx = indices[val_size:]
 
-    X_train = X_train_full[train_idx]
-    y_train = y_train_full[train_idx]
-    X_val = X_train_full[val_idx]
-    y_val = y_train_full[val_idx]
+    # The split gathers rows in random order, so decode the raw pixels to a
+    # uint8 scratch memmap first and gather (and normalize) from it.
+    scratch = os.path.join(args.cache_dir, FILES["train_images"] + ".u8.npy")
+    with run.stage("decode_split_train"):
+        try:
+            X_train_full = _decode_images(paths["train_images"], scratch, False, args.chunk_rows)
+            _write_rows(args.x_train, X_train_full, train_idx, normalize, args.chunk_rows)
+            _write_rows(args.x_val, X_train_full, val_idx, normalize, args.chunk_rows)
+            del X_train_full
+        finally:
+            if os.path.exists(scratch):
+                os.remove(scratch)
 
-    _write_array(args.x_train, X_train)
-    _write_array(args.y_train, y_train)
-    _write_array(args.x_val, X_val)
-    _write_array(args.y_val, y_val)
-    _write_array(args.x_test, X_test)
+    _write_array(args.y_train, y_train_full[train_idx])
+    _write_array(args.y_val, y_train_full[val_idx])
     _write_array(args.y_test, y_test)
 
+    if args.shard_dir:
+        with run.stage("shards"):
+            splits = {
+                "train": (args.x_train, args.y_train),
+                "val": (args.x_val, args.y_val),
+                "test": (args.x_test, args.y_test),
+            }
+            for split, (x_path, y_path) in splits.items():
+                write_shards(
+                    os.path.join(args.shard_dir, split),
+                    load_images(x_path),
+                    np.load(y_path),
+                    args.shard_size,
+                )
+    run.finish()
+
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,51 @@
 import argparse
+import math
 import os
+import sys
+import time
 
 import numpy as np
 
+from batch_loader import BatchLoader
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+from mnist_data import ShardedDataset, load_images, to_float32
+from parallel_trainer import DataParallelSGD
+from softmax_trainer import SoftmaxSGD
+from sweep_trainer import StackedSoftmaxSGD
+from train_checkpoint import file_stamp, load_checkpoint, save_checkpoint
+from training_control import (
+    SCHEDULES,
+    EarlyStopping,
+    is_validation_epoch,
+    scheduled_lr,
+    validation_subset,
+)
+
+# Options that change the training trajectory; --resume refuses a
+# checkpoint written with different values.
+CHECKPOINT_SETTINGS = (
+    "train_shards",
+    "shard_cache",
+    "epochs",
+    "lr",
+    "lr_schedule",
+    "lr_step_size",
+    "lr_gamma",
+    "min_lr",
+    "batch_size",
+    "max_train",
+    "seed",
+    "patience",
+    "min_delta",
+    "val_every",
+    "val_subsample",
+    "workers",
+    # BLAS thread count changes the workers' float32 reduction order.
+    "blas_threads",
+)
+# val_loss/val_accuracy are nan on epochs that skip validation (--val-every).
+METRICS_HEADER = "epoch\tval_loss\tval_accuracy\tlr\tepoch_seconds\tval_seconds\n"
+
 
 def softmax(logits: np.ndarray) -> np.ndarray:
     shifted = logits - logits.max(axis=1, keepdims=True)
@@ -19,75 +62,450 @@ def accuracy(logits: np.ndarray, y: np.ndarray) -> float:
     return float(np.mean(preds == y))
 
 
+def _epoch_batches(shards, loader, perm, batch_size: int, rng):
+    if shards is not None:
+        return shards.iter_batches(batch_size, rng)
+    return loader.epoch(perm)
+
+
+def _metrics_line(epoch, val_loss, val_acc, lr, epoch_s, val_s) -> str:
+    return f"{epoch}\t{val_loss:.6f}\t{val_acc:.6f}\t{lr:g}\t{epoch_s:.4f}\t{val_s:.4f}\n"
+
+
+def _write_metrics(path: str, rows) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(METRICS_HEADER)
+        for row in rows:
+            f.write(_metrics_line(*row))
+
+
+def _lr_for_epoch(args, base_lr: float, epoch: int) -> float:
+    return scheduled_lr(
+        base_lr,
+        epoch,
+        args.epochs,
+        args.lr_schedule,
+        args.lr_step_size,
+        args.lr_gamma,
+        args.min_lr,
+    )
+
+
+def _run_config(args) -> dict:
+    """Settings and inputs a checkpoint must match to be resumed."""
+    inputs = [args.x_train, args.y_train, args.x_val, args.y_val]
+    if args.train_shards:
+        inputs = [os.path.join(args.train_shards, "index.json"), args.x_val, args.y_val]
+    config = {name: getattr(args, name) for name in CHECKPOINT_SETTINGS}
+    config["inputs"] = {path: file_stamp(path) for path in inputs if path}
+    return config
+
+
+def run_sweep(args, X_train, y_train, shards, X_val, y_val, run) -> None:
+    """Train every (batch size, lr) config; one stacked pass per batch size."""
+    os.makedirs(args.sweep_dir, exist_ok=True)
+    n_train = X_train.shape[0]
+    results = []
+    for batch_size in args.sweep_batch_size:
+        # Same initial weights and batch order as a standalone run.
+        rng = np.random.default_rng(args.seed)
+        W = rng.normal(scale=0.01, size=(X_train.shape[1], 10)).astype(np.float32)
+        b = np.zeros(10, dtype=np.float32)
+        stacked = StackedSoftmaxSGD(W, b, args.sweep_lr, batch_size)
+        loader = (
+            BatchLoader(X_train, y_train, batch_size, args.prefetch)
+            if shards is None
+            else None
+        )
+        history = [[] for _ in args.sweep_lr]
+        perm = np.arange(n_train)
+        for epoch in range(1, args.epochs + 1):
+            start = time.perf_counter()
+            epoch_lrs = [_lr_for_epoch(args, lr, epoch) for lr in args.sweep_lr]
+            stacked.lrs[:] = epoch_lrs
+            if shards is None:
+                perm = perm[rng.permutation(n_train)]
+            with run.stage("train"):
+                for X_batch, y_batch in _epoch_batches(shards, loader, perm, batch_size, rng):
+                    stacked.step(to_float32(X_batch), y_batch)
+            val_start = time.perf_counter()
+            if is_validation_epoch(epoch, args.epochs, args.val_every):
+                with run.stage("validate"), np.errstate(over="ignore", invalid="ignore"):
+                    val_loss, val_acc = stacked.evaluate(X_val, y_val)
+            else:
+                val_loss = val_acc = np.full(len(args.sweep_lr), np.nan)
+            end = time.perf_counter()
+            for m in range(len(args.sweep_lr)):
+                history[m].append(
+                    (
+                        epoch,
+                        float(val_loss[m]),
+                        float(val_acc[m]),
+                        epoch_lrs[m],
+                        end - start,
+                        end - val_start,
+                    )
+                )
+
+        for m, lr in enumerate(args.sweep_lr):
+            name = f"lr{lr:g}_bs{batch_size}"
+            metrics_path = os.path.join(args.sweep_dir, f"{name}.tsv")
+            model_path = os.path.join(args.sweep_dir, f"{name}.npz")
+            _write_metrics(metrics_path, history[m])
+            W_m, b_m = stacked.weights(m)
+            np.savez(model_path, W=W_m, b=b_m)
+            results.append(
+                {
+                    "config": name,
+                    "lr": lr,
+                    "batch_size": batch_size,
+                    "history": history[m],
+                    "metrics": metrics_path,
+                    "model": model_path,
+                }
+            )
+
+    def rank_key(result):
+        _, loss, acc, *_ = result["history"][-1]
+        # Diverged (NaN) configs go last.
+        return (np.isnan(acc), -np.nan_to_num(acc), np.nan_to_num(loss, nan=np.inf))
+
+    results.sort(key=rank_key)
+    with open(os.path.join(args.sweep_dir, "leaderboard.tsv"), "w", encoding="utf-8") as f:
+        f.write(
+            "rank\tconfig\tlr\tbatch_size\tval_loss\tval_accuracy\t"
+            "best_epoch\tbest_val_accuracy\n"
+        )
+        for rank, result in enumerate(results, start=1):
+            _, loss, acc, *_ = result["history"][-1]
+            best = max(result["history"], key=lambda row: np.nan_to_num(row[2], nan=-1.0))
+            f.write(
+                f"{rank}\t{result['config']}\t{result['lr']:g}\t{result['batch_size']}\t"
+                f"{loss:.6f}\t{acc:.6f}\t{best[0]}\t{best[2]:.6f}\n"
+            )
+
+    best = results[0]
+    _write_metrics(args.metrics, best["history"])
+    os.makedirs(os.path.dirname(args.model), exist_ok=True)
+    with np.load(best["model"]) as model:
+        np.savez(args.model, W=model["W"], b=model["b"])
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Train a simple MNIST classifier")
-    parser.add_argument("--x-train", required=True)
-    parser.add_argument("--y-train", required=True)
+    parser.add_argument("--x-train", default=None)
+    parser.add_argument("--y-train", default=None)
+    parser.add_argument(
+        "--train-shards",
+        default=None,
+        help="Sharded training split (01_download.py --shard-dir) instead of --x/y-train",
+    )
+    parser.add_argument(
+        "--shard-cache", type=int, default=4, help="Shards held in memory at once"
+    )
     parser.add_argument("--x-val", required=True)
     parser.add_argument("--y-val", required=True)
     parser.add_argument("--model", required=True)
     parser.add_argument("--metrics", required=True)
     parser.add_argument("--epochs", type=int, default=5)
     parser.add_argument("--lr", type=float, default=0.2)
+    parser.add_argument(
+        "--lr-schedule",
+        choices=SCHEDULES,
+        default="constant",
+        help="step: multiply by --lr-gamma every --lr-step-size epochs; "
+        "cosine: anneal from --lr to --min-lr over --epochs",
+    )
+    parser.add_argument("--lr-step-size", type=int, default=1)
+    parser.add_argument("--lr-gamma", type=float, default=0.5)
+    parser.add_argument("--min-lr", type=float, default=0.0)
+    parser.add_argument(
+        "--patience",
+        type=int,
+        default=0,
+        help="Stop after this many epochs without a val loss improvement and "
+        "save the best epoch's weights (0 = always run --epochs)",
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=0.0, help="Smallest val loss drop that counts"
+    )
+    parser.add_argument(
+        "--val-every",
+        type=int,
+        default=1,
+        help="Validate every k epochs (and after the last one)",
+    )
+    parser.add_argument(
+        "--val-subsample",
+        type=int,
+        default=0,
+        help="Validate on a fixed random subset of this many rows (0 = all)",
+    )
     parser.add_argument("--batch-size", type=int, default=128)
     parser.add_argument("--max-train", type=int, default=20000)
     parser.add_argument("--seed", type=int, default=42)
-    return parser.parse_args()
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=2,
+        help="Batches gathered ahead on a background thread (0 = inline)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Split each batch across N worker processes (see parallel_trainer)",
+    )
+    parser.add_argument(
+        "--blas-threads", type=int, default=1, help="BLAS threads per worker with --workers"
+    )
+    parser.add_argument(
+        "--sweep-lr",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Train one model per learning rate in a single vectorized pass; "
+        "--model/--metrics get the best one",
+    )
+    parser.add_argument(
+        "--sweep-batch-size",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Batch sizes to cross with --sweep-lr (one pass each; default --batch-size)",
+    )
+    parser.add_argument(
+        "--sweep-dir",
+        default=None,
+        help="Per-config metrics/models and leaderboard.tsv for --sweep-lr",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Write an atomic training checkpoint here after every epoch; "
+        "deleted once the model is saved",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=0,
+        help="Also checkpoint every N batches within an epoch (not with --train-shards)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from --checkpoint if it exists and matches this run's "
+        "settings and inputs (bit-identical to an uninterrupted run)",
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    if args.train_shards is None and (args.x_train is None or args.y_train is None):
+        parser.error("either --x-train and --y-train or --train-shards is required")
+    if args.workers > 1 and args.train_shards is not None:
+        parser.error("--workers needs --x-train/--y-train")
+    if args.sweep_lr is not None:
+        if args.sweep_dir is None:
+            parser.error("--sweep-lr needs --sweep-dir")
+        if args.workers > 1:
+            parser.error("--sweep-lr does not support --workers")
+        if args.patience > 0:
+            parser.error("--sweep-lr does not support --patience")
+        if args.checkpoint is not None:
+            parser.error("--sweep-lr does not support --checkpoint")
+    if (args.resume or args.checkpoint_every) and args.checkpoint is None:
+        parser.error("--resume and --checkpoint-every need --checkpoint")
+    if args.checkpoint_every and args.train_shards is not None:
+        parser.error("--checkpoint-every needs --x-train/--y-train")
+    if args.val_every < 1 or args.lr_step_size < 1:
+        parser.error("--val-every and --lr-step-size must be at least 1")
+    if args.sweep_batch_size is None:
+        args.sweep_batch_size = [args.batch_size]
+    return args
 
 
 def main() -> None:
     args = parse_args()
-    X_train = np.load(args.x_train)
-    y_train = np.load(args.y_train)
-    X_val = np.load(args.x_val)
-    y_val = np.load(args.y_val)
+    run = RunTimer(args, args.model)
+    with run.stage("load"):
+        # With shards and no --max-train subsample, epochs stream the shards
+        # (``shards``); otherwise the rows are indexed directly.
+        shards = None
+        if args.train_shards:
+            shards = ShardedDataset(args.train_shards, cache_shards=args.shard_cache)
+            X_train, y_train = shards, shards.labels
+        else:
+            X_train = load_images(args.x_train)
+            y_train = np.load(args.y_train)
+        X_val, y_val = validation_subset(
+            load_images(args.x_val), np.load(args.y_val), args.val_subsample, args.seed
+        )
+        X_val = to_float32(X_val)
 
-    if args.max_train > 0 and X_train.shape[0] > args.max_train:
-        rng = np.random.default_rng(args.seed)
-        idx = rng.choice(X_train.shape[0], size=args.max_train, replace=False)
-        X_train = X_train[idx]
-        y_train = y_train[idx]
+        # Training rows as indices into --x-train; --workers gathers them there.
+        row_ids = np.arange(X_train.shape[0])
+        if args.max_train > 0 and X_train.shape[0] > args.max_train:
+            rng = np.random.default_rng(args.seed)
+            idx = rng.choice(X_train.shape[0], size=args.max_train, replace=False)
+            if shards is not None:
+                X_train, y_train = shards.take(idx)
+                shards = None
+            elif args.workers > 1:
+                row_ids = idx
+            else:
+                X_train = X_train[idx]
+                y_train = y_train[idx]
+                row_ids = np.arange(len(idx))
+        n_train = len(row_ids)
+
+    if args.sweep_lr is not None:
+        run_sweep(args, X_train, y_train, shards, X_val, y_val, run)
+        run.finish()
+        return
 
     n_features = X_train.shape[1]
     num_classes = 10
     rng = np.random.default_rng(args.seed)
     W = rng.normal(scale=0.01, size=(n_features, num_classes)).astype(np.float32)
     b = np.zeros(num_classes, dtype=np.float32)
+    stopper = EarlyStopping(args.patience, args.min_delta) if args.patience > 0 else None
+    best = None
+    # ``perm`` composes the per-epoch shuffles. Training resumes at batch
+    # ``first_batch`` of epoch ``first_epoch``; batch 0 means that epoch's
+    # shuffle has not been drawn yet.
+    perm = np.arange(n_train)
+    first_epoch, first_batch, resumed_seconds = 1, 0, 0.0
+    rows: list = []
+    stopped = False
+    config = _run_config(args)
+    if args.resume and os.path.exists(args.checkpoint):
+        arrays, meta = load_checkpoint(args.checkpoint)
+        if meta["config"] != config:
+            print(
+                f"{args.checkpoint} was written by a run with other settings or "
+                "inputs; starting from epoch 1",
+                file=sys.stderr,
+            )
+        else:
+            W, b, perm = arrays["W"], arrays["b"], arrays["perm"]
+            if "best_W" in arrays:
+                best = (arrays["best_W"], arrays["best_b"])
+            rng.bit_generator.state = meta["rng"]
+            first_epoch, first_batch = meta["epoch"], meta["batch"]
+            resumed_seconds = meta["epoch_seconds"]
+            rows = [tuple(row) for row in meta["metrics"]]
+            stopped = meta["stopped"]
+            if stopper is not None:
+                stopper.best_loss, stopper.best_epoch = meta["best_loss"], meta["best_epoch"]
+            print(f"Resuming from {args.checkpoint}: epoch {first_epoch}, batch {first_batch}")
 
-    os.makedirs(os.path.dirname(args.metrics), exist_ok=True)
-    with open(args.metrics, "w", encoding="utf-8") as f:
-        f.write("epoch\tval_loss\tval_accuracy\n")
+    parallel = None
+    if args.workers > 1:
+        parallel = DataParallelSGD(
+            args.x_train, args.y_train, W, b, args.batch_size, args.workers, args.blas_threads
+        )
+        W, b = parallel.W, parallel.b
+    trainer = SoftmaxSGD(W, b, args.batch_size)
 
-        for epoch in range(1, args.epochs + 1):
-            order = rng.permutation(X_train.shape[0])
-            X_train = X_train[order]
-            y_train = y_train[order]
+    def save(epoch: int, batch: int, epoch_seconds: float = 0.0) -> None:
+        arrays = {"W": W, "b": b, "perm": perm}
+        if best is not None:
+            arrays.update(best_W=best[0], best_b=best[1])
+        meta = {
+            "config": config,
+            "epoch": epoch,
+            "batch": batch,
+            "epoch_seconds": epoch_seconds,
+            "rng": rng.bit_generator.state,
+            "metrics": rows,
+            "stopped": stopped,
+            "best_loss": None if stopper is None else stopper.best_loss,
+            "best_epoch": None if stopper is None else stopper.best_epoch,
+        }
+        with run.stage("checkpoint"):
+            save_checkpoint(args.checkpoint, arrays, meta)
 
-            for start in range(0, X_train.shape[0], args.batch_size):
-                end = start + args.batch_size
-                X_batch = X_train[start:end]
-                y_batch = y_train[start:end]
+    n_batches = -(-n_train // args.batch_size)
 
-                logits = X_batch @ W + b
-                probs = softmax(logits)
-                loss_grad = probs
-                loss_grad[np.arange(len(y_batch)), y_batch] -= 1
-                loss_grad /= len(y_batch)
-
-                grad_W = X_batch.T @ loss_grad
-                grad_b = loss_grad.sum(axis=0)
+    def periodic_save(epoch: int, batch: int, epoch_start: float) -> None:
+        # Mid-epoch only; the checkpoint after the last batch waits for
+        # the epoch's validation.
+        if args.checkpoint_every and batch % args.checkpoint_every == 0 and batch < n_batches:
+            save(epoch, batch, time.perf_counter() - epoch_start)
+    os.makedirs(os.path.dirname(args.metrics), exist_ok=True)
+    try:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(METRICS_HEADER)
+            for row in rows:
+                f.write(_metrics_line(*row))
+            f.flush()
 
-                W -= args.lr * grad_W
-                b -= args.lr * grad_b
+            # Rows are gathered (and converted to float32) one batch at a
+            # time into reused buffers.
+            loader = (
+                BatchLoader(X_train, y_train, args.batch_size, args.prefetch)
+                if shards is None and parallel is None
+                else None
+            )
+            epoch = first_epoch
+            while epoch <= args.epochs and not stopped:
+                epoch_start = time.perf_counter() - resumed_seconds
+                lr = _lr_for_epoch(args, args.lr, epoch)
+                batch = first_batch
+                with run.stage("train"):
+                    if shards is not None:
+                        for X_batch, y_batch in shards.iter_batches(args.batch_size, rng):
+                            trainer.step(to_float32(X_batch), y_batch, lr)
+                    else:
+                        if batch == 0:
+                            order = rng.permutation(n_train)
+                            perm = perm[order]
+                        if parallel is not None:
+                            for start in range(batch * args.batch_size, n_train, args.batch_size):
+                                parallel.step(row_ids[perm[start : start + args.batch_size]], lr)
+                                batch += 1
+                                periodic_save(epoch, batch, epoch_start)
+                        else:
+                            for X_batch, y_batch in loader.epoch(perm[batch * args.batch_size :]):
+                                trainer.step(X_batch, y_batch, lr)
+                                batch += 1
+                                periodic_save(epoch, batch, epoch_start)
+                first_batch, resumed_seconds = 0, 0.0
 
-            val_logits = X_val @ W + b
-            val_probs = softmax(val_logits)
-            val_loss = cross_entropy(val_probs, y_val)
-            val_acc = accuracy(val_logits, y_val)
-            f.write(f"{epoch}\t{val_loss:.6f}\t{val_acc:.6f}\n")
+                val_start = time.perf_counter()
+                val_loss = val_acc = math.nan
+                validated = is_validation_epoch(epoch, args.epochs, args.val_every)
+                if validated:
+                    with run.stage("validate"):
+                        val_logits = X_val @ W + b
+                        val_probs = softmax(val_logits)
+                        val_loss = float(cross_entropy(val_probs, y_val))
+                        val_acc = accuracy(val_logits, y_val)
+                        if stopper is not None and stopper.update(epoch, val_loss):
+                            best = (W.copy(), b.copy())
+                end = time.perf_counter()
+                rows.append((epoch, val_loss, val_acc, lr, end - epoch_start, end - val_start))
+                f.write(_metrics_line(*rows[-1]))
+                f.flush()
+                stopped = stopper is not None and validated and stopper.should_stop(epoch)
+                epoch += 1
+                if args.checkpoint:
+                    save(epoch, 0)
+    finally:
+        if parallel is not None:
+            parallel.close()
+            W, b = parallel.W, parallel.b
 
-    os.makedirs(os.path.dirname(args.model), exist_ok=True)
-    np.savez(args.model, W=W, b=b)
+    if best is not None:
+        W, b = best
+    with run.stage("save"):
+        os.makedirs(os.path.dirname(args.model), exist_ok=True)
+        np.savez(args.model, W=W, b=b)
+    # A finished run's checkpoint would turn the next --resume into a no-op
+    # that rewrites this model, so it only outlives interrupted runs.
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    run.finish()
 
 
 if __name__ == "__main__":
@@ -1,29 +1,80 @@
 import argparse
+import hashlib
+import math
+import os
 
 import plotly.graph_objects as go
 import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from file_utils import atomic_write
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Plot epoch vs validation accuracy")
     parser.add_argument("--metrics", required=True)
     parser.add_argument("--html", required=True)
+    parser.add_argument(
+        "--plotlyjs",
+        choices=["inline", "shared"],
+        default="inline",
+        help="inline: embed plotly.js in the fragment; shared: reference one "
+        "plotly-<hash>.min.js written next to the HTML output",
+    )
+    parser.add_argument(
+        "--plotlyjs-path",
+        default=None,
+        help="With --plotlyjs shared, write plotly.js here instead of the hashed "
+        "name, so a workflow can declare it as an output",
+    )
+    add_instrumentation_arguments(parser)
     return parser.parse_args()
 
 
+def write_shared_plotlyjs(out_dir: str, path: str | None = None) -> str:
+    """Write plotly.js and return its path relative to out_dir.
+
+    Without ``path`` it goes to out_dir/plotly-<hash>.min.js, written once.
+    An explicit path is rewritten whenever it does not hold this plotly
+    version's file.
+    """
+    source = get_plotlyjs().encode("utf-8")
+    if path is None:
+        digest = hashlib.sha256(source).hexdigest()[:12]
+        path = os.path.join(out_dir, f"plotly-{digest}.min.js")
+        stale = not os.path.exists(path)
+    else:
+        try:
+            with open(path, "rb") as f:
+                stale = f.read() != source
+        except FileNotFoundError:
+            stale = True
+    if stale:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with atomic_write(path) as f:
+            f.write(source)
+    return os.path.relpath(path, out_dir)
+
+
 def main() -> None:
     args = parse_args()
+    run = RunTimer(args, args.html)
     epochs = []
     accs = []
 
-    with open(args.metrics, "r", encoding="utf-8") as f:
-        _ = next(f, None)
-        for line in f:
-            parts = line.strip().split("\t")
-            if len(parts) < 3:
-                continue
-            epochs.append(int(parts[0]))
-            accs.append(float(parts[2]))
+    with run.stage("read_metrics"):
+        with open(args.metrics, "r", encoding="utf-8") as f:
+            _ = next(f, None)
+            for line in f:
+                parts = line.strip().split("\t")
+                if len(parts) < 3:
+                    continue
+                acc = float(parts[2])
+                if math.isnan(acc):
+                    continue  # epoch without validation (--val-every)
+                epochs.append(int(parts[0]))
+                accs.append(acc)
 
     fig = go.Figure()
     fig.add_trace(
@@ -44,14 +95,23 @@ def main() -> None:
         margin=dict(l=60, r=20, t=60, b=50),
     )
 
-    html = pio.to_html(
-        fig,
-        include_plotlyjs="inline",
-        full_html=False,
-        config={"displayModeBar": False},
-    )
-    with open(args.html, "w", encoding="utf-8") as f:
-        f.write(html)
+    include_plotlyjs = "inline"
+    if args.plotlyjs == "shared":
+        # Relative src: the fragment is also pasted into other reports that
+        # live in the same output directory.
+        out_dir = os.path.dirname(os.path.abspath(args.html))
+        include_plotlyjs = write_shared_plotlyjs(out_dir, args.plotlyjs_path)
+
+    with run.stage("render"):
+        html = pio.to_html(
+            fig,
+            include_plotlyjs=include_plotlyjs,
+            full_html=False,
+            config={"displayModeBar": False},
+        )
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write(html)
+    run.finish()
 
 
 if __name__ == "__main__":
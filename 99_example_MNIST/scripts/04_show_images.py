@@ -1,64 +1,133 @@
 import argparse
 import os
 
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import numpy as np
 
+from image_render import captions, contact_sheet, grid_shape, thumbnails, to_uint8, write_png
+from inference import DEFAULT_CHUNK_ROWS, evaluate, save_evaluation
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+from mnist_data import ShardedDataset, load_images
+from png_export import export_pngs, write_manifest
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Show test images with predictions")
     parser.add_argument("--model", required=True)
-    parser.add_argument("--x-test", required=True)
-    parser.add_argument("--y-test", required=True)
+    parser.add_argument("--x-test", default=None)
+    parser.add_argument("--y-test", default=None)
+    parser.add_argument(
+        "--test-shards",
+        default=None,
+        help="Sharded test split (01_download.py --shard-dir) instead of --x/y-test",
+    )
     parser.add_argument("--out-dir", required=True)
     parser.add_argument("--acc", required=True)
     parser.add_argument("--seed", type=int, default=7)
     parser.add_argument("--n-images", type=int, default=25)
-    return parser.parse_args()
+    parser.add_argument("--scale", type=int, default=4, help="Thumbnail pixels per MNIST pixel")
+    parser.add_argument(
+        "--sprite",
+        default=None,
+        help="Also write all thumbnails as one contact-sheet PNG (keep it outside --out-dir)",
+    )
+    parser.add_argument(
+        "--columns", type=int, default=0, help="Contact-sheet columns (0 = near-square)"
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=DEFAULT_CHUNK_ROWS,
+        help="Test rows per inference chunk (bounds peak memory)",
+    )
+    parser.add_argument(
+        "--eval-dir",
+        default=None,
+        help="Also write the confusion matrix, per-class precision/recall, top-k "
+        "accuracy and hardest misclassified examples here (see inference)",
+    )
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="Processes encoding PNGs (see png_export)"
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    if args.test_shards is None and (args.x_test is None or args.y_test is None):
+        parser.error("either --x-test and --y-test or --test-shards is required")
+    return args
 
 
 def main() -> None:
     args = parse_args()
+    run = RunTimer(args, args.acc)
     model = np.load(args.model)
     W = model["W"]
     b = model["b"]
 
-    X_test = np.load(args.x_test)
-    y_test = np.load(args.y_test)
-
-    logits = X_test @ W + b
-    preds = np.argmax(logits, axis=1)
-    acc = float(np.mean(preds == y_test))
-
-    os.makedirs(args.out_dir, exist_ok=True)
-    for name in os.listdir(args.out_dir):
-        if name.lower().endswith(".png"):
-            try:
-                os.remove(os.path.join(args.out_dir, name))
-            except OSError:
-                pass
+    with run.stage("predict"):
+        if args.test_shards:
+            X_test = ShardedDataset(args.test_shards)
+            y_test = X_test.labels
+        else:
+            X_test = load_images(args.x_test)
+            y_test = np.load(args.y_test)
+        result = evaluate(W, b, X_test, y_test, args.chunk_rows, args.top_k)
+    preds = result["preds"]
+    acc = result["accuracy"]
+    if args.eval_dir:
+        save_evaluation(result, args.eval_dir)
 
     rng = np.random.default_rng(args.seed)
     indices = rng.choice(X_test.shape[0], size=args.n_images, replace=False)
 
-    for i, idx in enumerate(indices, start=1):
-        image = X_test[idx].reshape(28, 28)
-        fig, ax = plt.subplots(figsize=(2, 2))
-        ax.imshow(image, cmap="gray")
-        ax.set_title(f"p:{preds[idx]} t:{y_test[idx]}", fontsize=8)
-        ax.axis("off")
-        path = os.path.join(args.out_dir, f"{i:02d}.png")
-        fig.tight_layout(pad=0.2)
-        fig.savefig(path, dpi=150)
-        plt.close(fig)
+    if args.test_shards:
+        shown, _ = X_test.take(indices)
+    else:
+        shown = X_test[indices]
+
+    # All thumbnails are rendered in one vectorized pass; see image_render.
+    with run.stage("render_png"):
+        thumbs = thumbnails(
+            to_uint8(np.asarray(shown).reshape(-1, 28, 28)),
+            captions(preds[indices], y_test[indices]),
+            args.scale,
+        )
+        width = max(2, len(str(len(indices))))
+        names = [f"{i:0{width}d}.png" for i in range(1, len(indices) + 1)]
+        # Only images whose pixels changed since the last run are re-encoded.
+        hashes, _ = export_pngs(args.out_dir, names, thumbs, args.jobs)
+        entries = [
+            {
+                "file": name,
+                "index": int(idx),
+                "pred": int(preds[idx]),
+                "label": int(y_test[idx]),
+                "correct": bool(preds[idx] == y_test[idx]),
+                "sha256": digest,
+            }
+            for name, idx, digest in zip(names, indices, hashes)
+        ]
+
+    manifest = {"test_accuracy": acc, "images": entries}
+    if args.sprite:
+        with run.stage("sprite"):
+            pad = 2
+            h, w = thumbs.shape[1:]
+            _, cols = grid_shape(len(thumbs), args.columns)
+            for i, entry in enumerate(entries):
+                row, col = divmod(i, cols)
+                entry["sprite_box"] = [col * (w + pad), row * (h + pad), w, h]
+            os.makedirs(os.path.dirname(os.path.abspath(args.sprite)), exist_ok=True)
+            write_png(args.sprite, contact_sheet(thumbs, args.columns, pad))
+            manifest["sprite"] = os.path.relpath(
+                os.path.abspath(args.sprite), os.path.abspath(args.out_dir)
+            )
+    write_manifest(args.out_dir, manifest)
 
     os.makedirs(os.path.dirname(args.acc), exist_ok=True)
     with open(args.acc, "w", encoding="utf-8") as f:
         f.write(f"test_accuracy\t{acc:.6f}\n")
         f.write(f"num_samples\t{X_test.shape[0]}\n")
+    run.finish()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,12 @@
 import argparse
-import os
 
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import numpy as np
 
+from image_render import imsave_gray
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+from mnist_data import load_images, to_float32
+from png_export import export_pngs, write_manifest
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Save random MNIST test examples")
@@ -15,32 +15,38 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--out-dir", required=True)
     parser.add_argument("--seed", type=int, default=11)
     parser.add_argument("--n-images", type=int, default=10)
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="Processes encoding PNGs (see png_export)"
+    )
+    add_instrumentation_arguments(parser)
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    X_test = np.load(args.x_test)
-    y_test = np.load(args.y_test)
-
-    os.makedirs(args.out_dir, exist_ok=True)
-
-    for name in os.listdir(args.out_dir):
-        if name.lower().endswith(".png"):
-            try:
-                os.remove(os.path.join(args.out_dir, name))
-            except OSError:
-                pass
+    run = RunTimer(args, args.out_dir)
+    with run.stage("load"):
+        X_test = load_images(args.x_test)
+        y_test = np.load(args.y_test)
 
     rng = np.random.default_rng(args.seed)
     indices = rng.choice(X_test.shape[0], size=args.n_images, replace=False)
 
-    for i, idx in enumerate(indices, start=1):
-        image = X_test[idx].reshape(28, 28)
-        label = int(y_test[idx])
-        filename = f"04_test_example_{i:02d}_label{label}.png"
-        path = os.path.join(args.out_dir, filename)
-        plt.imsave(path, image, cmap="gray")
+    with run.stage("render_png"):
+        # Same RGBA pixels as the former plt.imsave(..., cmap="gray").
+        images = imsave_gray(to_float32(X_test[indices]).reshape(-1, 28, 28))
+        labels = [int(y_test[idx]) for idx in indices]
+        names = [
+            f"04_test_example_{i:02d}_label{label}.png"
+            for i, label in enumerate(labels, start=1)
+        ]
+        hashes, _ = export_pngs(args.out_dir, names, images, args.jobs)
+        entries = [
+            {"file": name, "index": int(idx), "label": label, "sha256": digest}
+            for name, idx, label, digest in zip(names, indices, labels, hashes)
+        ]
+        write_manifest(args.out_dir, {"images": entries})
+    run.finish()
 
 
 if __name__ == "__main__":
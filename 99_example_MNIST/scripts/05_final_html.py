@@ -2,6 +2,8 @@ import argparse
 import html
 import os
 
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Build final MNIST HTML report")
@@ -9,11 +11,13 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--acc", required=True)
     parser.add_argument("--plot-html", required=True)
     parser.add_argument("--html", required=True)
+    add_instrumentation_arguments(parser)
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    run = RunTimer(args, args.html)
     out_dir = args.out_dir
 
     accuracy_lines = []
@@ -42,7 +46,7 @@ def main() -> None:
     rows.append("    body { font-family: Arial, sans-serif; margin: 24px; }")
     rows.append("    img { max-width: 420px; height: auto; display: block; }")
     rows.append("    .strip { display: flex; gap: 10px; flex-wrap: nowrap; overflow-x: auto; }")
-    rows.append("    .strip img { width: 64px; height: 64px; image-rendering: pixelated; }")
+    rows.append("    .strip img { width: 64px; height: auto; image-rendering: pixelated; }")
     rows.append("    .meta { margin-bottom: 16px; }")
     rows.append("    .section { margin-top: 28px; }")
     rows.append("  </style>")
@@ -82,9 +86,11 @@ def main() -> None:
     rows.append("</body>")
     rows.append("</html>")
 
-    os.makedirs(os.path.dirname(args.html), exist_ok=True)
-    with open(args.html, "w", encoding="utf-8") as f:
-        f.write("\n".join(rows))
+    with run.stage("write"):
+        os.makedirs(os.path.dirname(args.html), exist_ok=True)
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write("\n".join(rows))
+    run.finish()
 
 
 if __name__ == "__main__":
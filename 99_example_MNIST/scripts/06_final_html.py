@@ -2,23 +2,28 @@ import argparse
 import html
 import os
 
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Build final HTML report")
     parser.add_argument("--out-dir", required=True)
     parser.add_argument("--acc", required=True)
     parser.add_argument("--html", required=True)
+    add_instrumentation_arguments(parser)
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    all_pngs = []
-    for root, _, files in os.walk(args.out_dir):
-        for name in files:
-            if name.lower().endswith(".png"):
-                all_pngs.append(os.path.join(root, name))
-    all_pngs.sort()
+    run = RunTimer(args, args.html)
+    with run.stage("scan"):
+        all_pngs = []
+        for root, _, files in os.walk(args.out_dir):
+            for name in files:
+                if name.lower().endswith(".png"):
+                    all_pngs.append(os.path.join(root, name))
+        all_pngs.sort()
 
     test_images_dir = os.path.join(args.out_dir, "05_test_images")
     test_pngs = [p for p in all_pngs if os.path.dirname(p) == test_images_dir]
@@ -82,9 +87,11 @@ def main() -> None:
     rows.append("</body>")
     rows.append("</html>")
 
-    os.makedirs(os.path.dirname(args.html), exist_ok=True)
-    with open(args.html, "w", encoding="utf-8") as f:
-        f.write("\n".join(rows))
+    with run.stage("write"):
+        os.makedirs(os.path.dirname(args.html), exist_ok=True)
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write("\n".join(rows))
+    run.finish()
 
 
 if __name__ == "__main__":
@@ -1,29 +1,48 @@
 import argparse
-import os
 
 import numpy as np
 
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+from matrix_io import write_f32_matrix, write_tsv_matrix
+from mnist_data import load_images
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Export MNIST training data to TSV")
     parser.add_argument("--x-train", required=True)
-    parser.add_argument("--out-tsv", required=True)
+    parser.add_argument("--out-tsv", default="", help="Text output; gzip-compressed if it ends in .gz")
+    parser.add_argument(
+        "--out-bin",
+        default="",
+        help="Also write a little-endian float32 matrix with a JSON header (read by 11_jackstraw.R)",
+    )
     parser.add_argument("--max-samples", type=int, default=5000)
     parser.add_argument("--seed", type=int, default=123)
-    return parser.parse_args()
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    if not args.out_tsv and not args.out_bin:
+        parser.error("at least one of --out-tsv and --out-bin is required")
+    return args
 
 
 def main() -> None:
     args = parse_args()
-    X = np.load(args.x_train)
-
-    if args.max_samples > 0 and X.shape[0] > args.max_samples:
-        rng = np.random.default_rng(args.seed)
-        idx = rng.choice(X.shape[0], size=args.max_samples, replace=False)
-        X = X[idx]
-
-    os.makedirs(os.path.dirname(args.out_tsv), exist_ok=True)
-    np.savetxt(args.out_tsv, X, delimiter="\t", fmt="%.6f")
+    run = RunTimer(args, args.out_tsv or args.out_bin)
+    with run.stage("load"):
+        X = load_images(args.x_train)
+
+        if args.max_samples > 0 and X.shape[0] > args.max_samples:
+            rng = np.random.default_rng(args.seed)
+            idx = rng.choice(X.shape[0], size=args.max_samples, replace=False)
+            X = X[idx]
+
+    if args.out_tsv:
+        with run.stage("write_tsv"):
+            write_tsv_matrix(args.out_tsv, X)
+    if args.out_bin:
+        with run.stage("write_bin"):
+            write_f32_matrix(args.out_bin, X)
+    run.finish()
 
 
 if __name__ == "__main__":
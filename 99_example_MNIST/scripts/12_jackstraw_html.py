@@ -2,12 +2,15 @@ import argparse
 import html
 import os
 
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Build jackstraw HTML report")
     parser.add_argument("--summary-tsv", required=True)
     parser.add_argument("--pvals-tsv", required=True)
     parser.add_argument("--html", required=True)
+    add_instrumentation_arguments(parser)
     return parser.parse_args()
 
 
@@ -41,6 +44,7 @@ def read_pvals(path: str, limit: int = 50) -> list[tuple[str, str, str]]:
 
 def main() -> None:
     args = parse_args()
+    run = RunTimer(args, args.html)
 
     summary_rows = read_summary(args.summary_tsv)
     pvals_rows = read_pvals(args.pvals_tsv)
@@ -91,9 +95,11 @@ def main() -> None:
     rows.append("</body>")
     rows.append("</html>")
 
-    os.makedirs(os.path.dirname(args.html), exist_ok=True)
-    with open(args.html, "w", encoding="utf-8") as f:
-        f.write("\n".join(rows))
+    with run.stage("write"):
+        os.makedirs(os.path.dirname(args.html), exist_ok=True)
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write("\n".join(rows))
+    run.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+import argparse
+import glob
+import html
+import os
+
+from instrumentation import TIMINGS_SUFFIX, load_timings
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the pipeline timing report")
+    parser.add_argument(
+        "--timings-dir",
+        nargs="+",
+        default=[],
+        help=f"Directories searched for *{TIMINGS_SUFFIX} files",
+    )
+    parser.add_argument(
+        "--timings",
+        nargs="+",
+        default=[],
+        help=f"{TIMINGS_SUFFIX} files to include (the Snakefile lists every step's)",
+    )
+    parser.add_argument("--html", required=True)
+    args = parser.parse_args()
+    if not args.timings_dir and not args.timings:
+        parser.error("give --timings-dir or --timings")
+    return args
+
+
+def bar(fraction: float) -> str:
+    width = max(0.0, min(1.0, fraction)) * 100
+    return f"<div class=\"bar\"><span style=\"width: {width:.1f}%\"></span></div>"
+
+
+def main() -> None:
+    args = parse_args()
+    paths = list(args.timings)
+    for directory in args.timings_dir:
+        paths.extend(glob.glob(os.path.join(directory, "*" + TIMINGS_SUFFIX)))
+    reports = sorted(load_timings(paths), key=lambda report: report["script"])
+    total = sum(report["seconds"] for report in reports)
+
+    rows = []
+    rows.append("<html>")
+    rows.append("<head>")
+    rows.append("  <meta charset=\"utf-8\" />")
+    rows.append("  <title>Pipeline Timings</title>")
+    rows.append("  <style>")
+    rows.append("    body { font-family: Arial, sans-serif; margin: 24px; }")
+    rows.append("    table { border-collapse: collapse; margin-top: 12px; }")
+    rows.append("    th, td { border: 1px solid #ddd; padding: 6px 10px; text-align: left; }")
+    rows.append("    td.num { text-align: right; font-variant-numeric: tabular-nums; }")
+    rows.append("    .bar { width: 200px; height: 10px; background: #eee; }")
+    rows.append("    .bar span { display: block; height: 100%; background: #1f77b4; }")
+    rows.append("    .section { margin-top: 24px; }")
+    rows.append("  </style>")
+    rows.append("</head>")
+    rows.append("<body>")
+    rows.append("  <h1>Pipeline Timings</h1>")
+
+    rows.append("  <div class=\"section\">")
+    rows.append("    <h3>Scripts</h3>")
+    if reports:
+        rows.append("    <table>")
+        rows.append(
+            "      <tr><th>Script</th><th>Wall s</th><th>CPU s</th>"
+            "<th>Peak RSS MB</th><th>Share</th><th>Finished</th></tr>"
+        )
+        for report in reports:
+            rss = report["peak_rss_mb"]
+            if report.get("children_peak_rss_mb"):
+                rss = f"{rss:.1f} (workers {report['children_peak_rss_mb']:.1f})"
+            else:
+                rss = f"{rss:.1f}"
+            rows.append(
+                f"      <tr><td>{html.escape(report['script'])}</td>"
+                f"<td class=\"num\">{report['seconds']:.2f}</td>"
+                f"<td class=\"num\">{report['cpu_seconds']:.2f}</td>"
+                f"<td class=\"num\">{html.escape(rss)}</td>"
+                f"<td>{bar(report['seconds'] / total if total else 0.0)}</td>"
+                f"<td>{html.escape(report['finished'])}</td></tr>"
+            )
+        rows.append(
+            f"      <tr><th>Total</th><th class=\"num\">{total:.2f}</th>"
+            "<th></th><th></th><th></th><th></th></tr>"
+        )
+        rows.append("    </table>")
+    else:
+        rows.append("    <p>No timing files found.</p>")
+    rows.append("  </div>")
+
+    for report in reports:
+        rows.append("  <div class=\"section\">")
+        rows.append(f"    <h3>{html.escape(report['script'])}</h3>")
+        rows.append(f"    <p><code>{html.escape(' '.join(report['argv']))}</code></p>")
+        rows.append("    <table>")
+        rows.append(
+            "      <tr><th>Stage</th><th>Calls</th><th>Wall s</th><th>CPU s</th>"
+            "<th>Peak RSS MB</th><th>Share of run</th></tr>"
+        )
+        for stage in report["stages"]:
+            share = stage["seconds"] / report["seconds"] if report["seconds"] else 0.0
+            rows.append(
+                f"      <tr><td>{html.escape(stage['name'])}</td>"
+                f"<td class=\"num\">{stage['calls']}</td>"
+                f"<td class=\"num\">{stage['seconds']:.3f}</td>"
+                f"<td class=\"num\">{stage['cpu_seconds']:.3f}</td>"
+                f"<td class=\"num\">{stage['peak_rss_mb']:.1f}</td>"
+                f"<td>{bar(share)}</td></tr>"
+            )
+        rows.append("    </table>")
+        rows.append("  </div>")
+
+    rows.append("</body>")
+    rows.append("</html>")
+
+    os.makedirs(os.path.dirname(args.html), exist_ok=True)
+    with open(args.html, "w", encoding="utf-8") as f:
+        f.write("\n".join(rows))
+
+
+if __name__ == "__main__":
+    main()
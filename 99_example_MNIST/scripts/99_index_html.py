@@ -2,17 +2,22 @@ import argparse
 import html
 import os
 
+from instrumentation import RunTimer, add_arguments as add_instrumentation_arguments
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Build top-level HTML index")
     parser.add_argument("--mnist-html", required=True)
     parser.add_argument("--jackstraw-html", required=True)
+    parser.add_argument("--timings-html", default=None)
     parser.add_argument("--html", required=True)
+    add_instrumentation_arguments(parser)
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    run = RunTimer(args, args.html)
 
     rows = []
     rows.append("<html>")
@@ -39,13 +44,22 @@ def main() -> None:
             html.escape(os.path.basename(args.jackstraw_html)),
         )
     )
+    if args.timings_html:
+        rows.append(
+            "    <li><a href=\"{}\">{}</a></li>".format(
+                html.escape(os.path.basename(args.timings_html)),
+                html.escape(os.path.basename(args.timings_html)),
+            )
+        )
     rows.append("  </ul>")
     rows.append("</body>")
     rows.append("</html>")
 
-    os.makedirs(os.path.dirname(args.html), exist_ok=True)
-    with open(args.html, "w", encoding="utf-8") as f:
-        f.write("\n".join(rows))
+    with run.stage("write"):
+        os.makedirs(os.path.dirname(args.html), exist_ok=True)
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write("\n".join(rows))
+    run.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+"""Mini-batch iterator with background prefetching for 02_train_model.py.
+
+``BatchLoader.epoch(perm)`` yields the rows of ``X``/``y`` in ``perm`` order,
+``batch_size`` at a time, without ever copying the dataset: each batch is
+gathered straight into one slot of a ring of preallocated buffers (and
+converted to float32 there, see ``mnist_data.to_float32``). With
+``prefetch > 0`` a background thread fills the next ``prefetch`` slots
+while the caller works on the current one, so gathering overlaps with the
+matmuls, which release the GIL.
+
+A yielded batch is a view into a ring slot: it is only valid until the
+next batch is requested.
+"""
+import queue
+import threading
+from typing import Iterator
+
+import numpy as np
+
+_DONE = object()
+
+
+class BatchLoader:
+    def __init__(
+        self, X: np.ndarray, y: np.ndarray, batch_size: int, prefetch: int = 2
+    ) -> None:
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+        self.prefetch = max(0, prefetch)
+        n_slots = self.prefetch + 1
+        rows = min(batch_size, len(X))
+        self._X_slots = np.empty((n_slots, rows, X.shape[1]), dtype=np.float32)
+        self._y_slots = np.empty((n_slots, rows), dtype=y.dtype)
+        # uint8 storage is gathered here first, then converted into a slot.
+        self._staging = (
+            np.empty((n_slots, rows, X.shape[1]), dtype=X.dtype)
+            if X.dtype != np.float32
+            else None
+        )
+
+    def _fill(self, slot: int, idx: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        n = len(idx)
+        X_out = self._X_slots[slot, :n]
+        if self._staging is None:
+            np.take(self.X, idx, axis=0, out=X_out)
+        else:
+            staging = self._staging[slot, :n]
+            np.take(self.X, idx, axis=0, out=staging)
+            X_out[...] = staging
+            np.divide(X_out, 255.0, out=X_out)
+        y_out = self._y_slots[slot, :n]
+        np.take(self.y, idx, out=y_out)
+        return X_out, y_out
+
+    def _batch_indices(self, perm: np.ndarray) -> Iterator[np.ndarray]:
+        for start in range(0, len(perm), self.batch_size):
+            yield perm[start : start + self.batch_size]
+
+    def epoch(self, perm: np.ndarray) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        if self.prefetch == 0:
+            for idx in self._batch_indices(perm):
+                yield self._fill(0, idx)
+            return
+
+        free: queue.Queue = queue.Queue()
+        ready: queue.Queue = queue.Queue()
+        for slot in range(self.prefetch + 1):
+            free.put(slot)
+        stop = threading.Event()
+
+        def produce() -> None:
+            try:
+                for idx in self._batch_indices(perm):
+                    slot = free.get()
+                    if stop.is_set():
+                        return
+                    ready.put((slot, self._fill(slot, idx)))
+                ready.put(_DONE)
+            except BaseException as exc:  # noqa: BLE001
+                ready.put(exc)
+
+        producer = threading.Thread(target=produce, name="batch-prefetch", daemon=True)
+        producer.start()
+        # The slot handed out last belongs to the caller until it asks for
+        # the next batch; only then does it go back to the producer.
+        held = None
+        try:
+            while True:
+                if held is not None:
+                    free.put(held)
+                    held = None
+                item = ready.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                held, batch = item
+                yield batch
+        finally:
+            stop.set()
+            free.put(0)
+            producer.join()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Benchmark batch loading for 02_train_model.py's training loop.
+
+Usage:
+  python scripts/bench_batch_loader.py --n-samples 60000 --storage uint8
+  python scripts/bench_batch_loader.py --x-train raw_data/01_X_train.npy \
+      --y-train raw_data/01_y_train.npy
+
+Compares three ways of feeding the same SGD step:
+  copy      the original loop: X[order] copies the training set every epoch
+  inline    BatchLoader with prefetch=0 (gather into a reused buffer)
+  prefetch  BatchLoader gathering --prefetch batches ahead on a thread
+
+Each mode runs in a fresh subprocess so its peak RSS (ru_maxrss, which
+includes the memory-mapped pages it touched) is measured on its own.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from batch_loader import BatchLoader
+from mnist_data import load_images, to_float32
+
+MODES = ["copy", "inline", "prefetch"]
+
+
+def _sgd_step(X_batch: np.ndarray, y_batch: np.ndarray, W: np.ndarray, lr: float) -> None:
+    logits = X_batch @ W
+    logits -= logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    probs /= probs.sum(axis=1, keepdims=True)
+    probs[np.arange(len(y_batch)), y_batch] -= 1
+    W -= lr / len(y_batch) * (X_batch.T @ probs)
+
+
+def run_mode(args: argparse.Namespace) -> dict:
+    X = load_images(args.x_train)
+    y = np.load(args.y_train)
+    rng = np.random.default_rng(0)
+    W = np.zeros((X.shape[1], 10), dtype=np.float32)
+    loader = None
+    if args.mode != "copy":
+        prefetch = args.prefetch if args.mode == "prefetch" else 0
+        loader = BatchLoader(X, y, args.batch_size, prefetch)
+
+    epoch_times = []
+    perm = np.arange(len(y))
+    for _ in range(args.epochs):
+        start = time.perf_counter()
+        order = rng.permutation(len(y))
+        if loader is None:
+            X_epoch = to_float32(np.asarray(X))[order]
+            y_epoch = y[order]
+            for b in range(0, len(y), args.batch_size):
+                end = b + args.batch_size
+                _sgd_step(X_epoch[b:end], y_epoch[b:end], W, 0.1)
+            del X_epoch, y_epoch
+        else:
+            perm = perm[order]
+            for X_batch, y_batch in loader.epoch(perm):
+                _sgd_step(X_batch, y_batch, W, 0.1)
+        epoch_times.append(time.perf_counter() - start)
+
+    return {
+        "mode": args.mode,
+        "epoch_s": float(np.mean(epoch_times)),
+        "best_epoch_s": float(np.min(epoch_times)),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _make_dataset(tmp: str, n_samples: int, storage: str) -> tuple[str, str]:
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(n_samples, 784), dtype=np.uint8)
+    X = pixels if storage == "uint8" else to_float32(pixels)
+    x_path = os.path.join(tmp, "X.npy")
+    y_path = os.path.join(tmp, "y.npy")
+    np.save(x_path, X)
+    np.save(y_path, rng.integers(0, 10, size=n_samples).astype(np.int64))
+    return x_path, y_path
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the prefetching batch loader")
+    parser.add_argument("--x-train", default=None)
+    parser.add_argument("--y-train", default=None)
+    parser.add_argument("--n-samples", type=int, default=60000, help="Synthetic data size")
+    parser.add_argument("--storage", choices=["float32", "uint8"], default="float32")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--mode", choices=MODES, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.mode is not None:
+        print(json.dumps(run_mode(args)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.x_train is None:
+            args.x_train, args.y_train = _make_dataset(tmp, args.n_samples, args.storage)
+        rows = []
+        for mode in args.modes:
+            cmd = [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--mode",
+                mode,
+                "--x-train",
+                args.x_train,
+                "--y-train",
+                args.y_train,
+                "--batch-size",
+                str(args.batch_size),
+                "--epochs",
+                str(args.epochs),
+                "--prefetch",
+                str(args.prefetch),
+            ]
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            rows.append(json.loads(out.strip().splitlines()[-1]))
+        X = load_images(args.x_train)
+        shape, dtype = X.shape, X.dtype
+        del X
+
+    print(
+        f"{shape[0]} x {shape[1]} {dtype}, batch {args.batch_size}, "
+        f"{args.epochs} epochs, prefetch {args.prefetch}"
+    )
+    header = ["mode", "epoch_s", "best_epoch_s", "peak_rss_mb"]
+    print("\t".join(header))
+    for row in rows:
+        cells = []
+        for key in header:
+            value = row[key]
+            cells.append(f"{value:.3f}" if isinstance(value, float) else str(value))
+        print("\t".join(cells))
+
+
+if __name__ == "__main__":
+    main()
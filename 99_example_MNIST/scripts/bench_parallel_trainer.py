@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Scaling benchmark for 02_train_model.py --workers (parallel_trainer).
+
+Usage:
+  python scripts/bench_parallel_trainer.py --max-workers 32 --batch-size 1024
+
+Trains the same epochs once in-process with SoftmaxSGD ("serial") and then
+with DataParallelSGD at 1, 2, 4, ... --max-workers workers, all from the
+same initial weights and batch order. Reports seconds per epoch, speedup
+and parallel efficiency against serial, and the largest difference in W
+from the serial run (0 for one worker; float32 rounding otherwise).
+Worker start-up is excluded from the timings. On the synthetic noise data
+a large --lr makes SGD chaotic, which amplifies that rounding; use the
+real training files or a small --lr when comparing weights.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from mnist_data import load_images, to_float32
+from parallel_trainer import DataParallelSGD
+from softmax_trainer import SoftmaxSGD
+
+
+def _worker_counts(max_workers: int) -> list[int]:
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def _make_dataset(tmp: str, n_samples: int) -> tuple[str, str]:
+    rng = np.random.default_rng(0)
+    x_path = os.path.join(tmp, "X.npy")
+    y_path = os.path.join(tmp, "y.npy")
+    np.save(x_path, rng.integers(0, 256, size=(n_samples, 784), dtype=np.uint8))
+    np.save(y_path, rng.integers(0, 10, size=n_samples).astype(np.int64))
+    return x_path, y_path
+
+
+def _initial_weights(n_features: int, seed: int):
+    rng = np.random.default_rng(seed)
+    W = rng.normal(scale=0.01, size=(n_features, 10)).astype(np.float32)
+    return W, np.zeros(10, dtype=np.float32)
+
+
+def _epoch_orders(n: int, epochs: int, seed: int) -> list[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return [rng.permutation(n) for _ in range(epochs)]
+
+
+def run_serial(x_path, y_path, args, orders) -> tuple[float, np.ndarray]:
+    X = load_images(x_path)
+    y = np.load(y_path)
+    W, b = _initial_weights(X.shape[1], args.seed)
+    trainer = SoftmaxSGD(W, b, args.batch_size)
+    start = time.perf_counter()
+    for order in orders:
+        for s in range(0, len(order), args.batch_size):
+            idx = order[s : s + args.batch_size]
+            trainer.step(to_float32(X[idx]), y[idx], args.lr)
+    return (time.perf_counter() - start) / len(orders), W
+
+
+def run_parallel(
+    x_path, y_path, args, orders, workers: int
+) -> tuple[float, np.ndarray]:
+    W, b = _initial_weights(load_images(x_path).shape[1], args.seed)
+    with DataParallelSGD(
+        x_path, y_path, W, b, args.batch_size, workers, args.blas_threads
+    ) as trainer:
+        trainer.step(orders[0][: args.batch_size], 0.0)  # wait for start-up
+        start = time.perf_counter()
+        for order in orders:
+            for s in range(0, len(order), args.batch_size):
+                trainer.step(order[s : s + args.batch_size], args.lr)
+        elapsed = time.perf_counter() - start
+    return elapsed / len(orders), trainer.W
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark data-parallel training")
+    parser.add_argument("--x-train", default=None)
+    parser.add_argument("--y-train", default=None)
+    parser.add_argument("--n-samples", type=int, default=60000, help="Synthetic data size")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--blas-threads", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--lr", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        x_path, y_path = args.x_train, args.y_train
+        if x_path is None:
+            x_path, y_path = _make_dataset(tmp, args.n_samples)
+        n = len(np.load(y_path, mmap_mode="r"))
+        orders = _epoch_orders(n, args.epochs, args.seed)
+
+        serial_s, W_serial = run_serial(x_path, y_path, args, orders)
+        rows = [("serial", serial_s, 1.0, 1.0, 0.0)]
+        for workers in _worker_counts(args.max_workers):
+            epoch_s, W = run_parallel(x_path, y_path, args, orders, workers)
+            speedup = serial_s / epoch_s
+            diff = float(np.abs(W - W_serial).max())
+            rows.append((workers, epoch_s, speedup, speedup / workers, diff))
+
+    print(
+        f"{n} samples, batch {args.batch_size}, {args.epochs} epochs, "
+        f"{args.blas_threads} BLAS thread(s) per worker, {os.cpu_count()} CPUs"
+    )
+    print("workers\tepoch_s\tspeedup\tefficiency\tmax_abs_dW")
+    for workers, epoch_s, speedup, efficiency, diff in rows:
+        print(f"{workers}\t{epoch_s:.3f}\t{speedup:.2f}\t{efficiency:.2f}\t{diff:.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Check and benchmark softmax_trainer.SoftmaxSGD against the original step.
+
+Usage:
+  python scripts/bench_softmax_trainer.py --batch-sizes 32 128 512 1024
+
+For each batch size both steps train from the same initial weights on the
+same batches. The script exits non-zero unless the resulting W and b are
+bit-identical. It then reports time per step and the peak memory allocated
+per step (numpy reports its buffers to tracemalloc).
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from softmax_trainer import SoftmaxSGD
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def reference_step(X_batch, y_batch, W, b, lr) -> None:
+    # The loop body 02_train_model.py used before SoftmaxSGD.
+    logits = X_batch @ W + b
+    probs = softmax(logits)
+    loss_grad = probs
+    loss_grad[np.arange(len(y_batch)), y_batch] -= 1
+    loss_grad /= len(y_batch)
+
+    grad_W = X_batch.T @ loss_grad
+    grad_b = loss_grad.sum(axis=0)
+
+    W -= lr * grad_W
+    b -= lr * grad_b
+
+
+def _batches(X, y, batch_size, n_steps):
+    n = len(y) // batch_size * batch_size
+    for i in range(n_steps):
+        start = i * batch_size % n
+        yield X[start : start + batch_size], y[start : start + batch_size]
+
+
+def _initial_weights(n_features: int, seed: int):
+    rng = np.random.default_rng(seed)
+    W = rng.normal(scale=0.01, size=(n_features, 10)).astype(np.float32)
+    return W, np.zeros(10, dtype=np.float32)
+
+
+def _peak_step_bytes(step, X, y) -> int:
+    step(X, y)  # warm up outside tracing
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        step(X, y)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def _time_steps(
+    make_step, X, y, batch_size: int, n_steps: int, seed: int, repeat: int
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        step = make_step(*_initial_weights(X.shape[1], seed))
+        start = time.perf_counter()
+        for X_batch, y_batch in _batches(X, y, batch_size, n_steps):
+            step(X_batch, y_batch)
+        best = min(best, time.perf_counter() - start)
+    return best / n_steps
+
+
+def bench(X, y, batch_size: int, n_steps: int, lr: float, seed: int, repeat: int) -> dict:
+    def make_ref(W, b):
+        return lambda X_batch, y_batch: reference_step(X_batch, y_batch, W, b, lr)
+
+    def make_fused(W, b):
+        trainer = SoftmaxSGD(W, b, batch_size)
+        return lambda X_batch, y_batch: trainer.step(X_batch, y_batch, lr)
+
+    W_ref, b_ref = _initial_weights(X.shape[1], seed)
+    W_new, b_new = _initial_weights(X.shape[1], seed)
+    ref, new = make_ref(W_ref, b_ref), make_fused(W_new, b_new)
+    for X_batch, y_batch in _batches(X, y, batch_size, n_steps):
+        ref(X_batch, y_batch)
+        new(X_batch, y_batch)
+    identical = np.array_equal(W_ref, W_new) and np.array_equal(b_ref, b_new)
+
+    ref_s = _time_steps(make_ref, X, y, batch_size, n_steps, seed, repeat)
+    new_s = _time_steps(make_fused, X, y, batch_size, n_steps, seed, repeat)
+    X_batch, y_batch = X[:batch_size], y[:batch_size]
+    return {
+        "batch": batch_size,
+        "identical": identical,
+        "ref_us": ref_s * 1e6,
+        "fused_us": new_s * 1e6,
+        "speedup": ref_s / new_s,
+        "ref_alloc_kb": _peak_step_bytes(ref, X_batch, y_batch) / 1024,
+        "fused_alloc_kb": _peak_step_bytes(new, X_batch, y_batch) / 1024,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the fused softmax trainer")
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[32, 64, 128, 256, 512, 1024]
+    )
+    parser.add_argument("--n-samples", type=int, default=20000)
+    parser.add_argument("--n-features", type=int, default=784)
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is kept")
+    parser.add_argument("--lr", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    X = rng.random((args.n_samples, args.n_features), dtype=np.float32)
+    y = rng.integers(0, 10, size=args.n_samples)
+
+    rows = [
+        bench(X, y, batch_size, args.steps, args.lr, args.seed, args.repeat)
+        for batch_size in args.batch_sizes
+    ]
+    header = [
+        "batch", "identical", "ref_us", "fused_us", "speedup", "ref_alloc_kb", "fused_alloc_kb"
+    ]
+    print("\t".join(header))
+    for row in rows:
+        cells = []
+        for key in header:
+            value = row[key]
+            cells.append(f"{value:.2f}" if isinstance(value, float) else str(value))
+        print("\t".join(cells))
+    if not all(row["identical"] for row in rows):
+        sys.exit("SoftmaxSGD diverged from the reference step")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""File helpers shared by the pipeline scripts.
+
+- ``sha256_file`` hashes a file in 1 MiB blocks.
+- ``atomic_write`` writes to ``<path>.tmp`` and moves it over ``path`` with
+  ``os.replace`` only when the ``with`` block succeeds, so readers and
+  reruns after a crash never see a half-written file.
+"""
+from contextlib import contextmanager
+import hashlib
+import os
+from typing import IO, Iterator
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "wb", fsync: bool = False, **open_kwargs) -> Iterator[IO]:
+    """Open a temporary file that replaces ``path`` on success (fsynced first if asked)."""
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, mode, **open_kwargs) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
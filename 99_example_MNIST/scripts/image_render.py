@@ -0,0 +1,159 @@
+"""Render MNIST thumbnails and contact sheets straight from NumPy arrays.
+
+Used by 04_show_images.py in place of one matplotlib figure per image.
+Every step works on the whole batch at once:
+
+- ``to_uint8`` turns [0, 1] floats (or uint8 storage) into 8-bit pixels.
+- ``thumbnails`` upscales each image by pixel repetition and draws a
+  ``p:<pred> t:<label>`` caption above it with a built-in 3x5 bitmap font.
+- ``contact_sheet`` tiles the thumbnails into one grid image.
+- ``encode_png`` writes grayscale, RGB or RGBA pixels as PNG with zlib.
+- ``imsave_gray`` reproduces the RGBA pixels of
+  ``plt.imsave(path, image, cmap="gray")`` for 04_test_examples.py.
+
+None of it needs matplotlib or Pillow.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+INK, PAPER = 0, 255
+
+# 3x5 glyphs, one string per row; "#" is ink.
+_FONT_ROWS = {
+    "0": ("###", "#.#", "#.#", "#.#", "###"),
+    "1": (".#.", "##.", ".#.", ".#.", "###"),
+    "2": ("###", "..#", "###", "#..", "###"),
+    "3": ("###", "..#", ".##", "..#", "###"),
+    "4": ("#.#", "#.#", "###", "..#", "..#"),
+    "5": ("###", "#..", "###", "..#", "###"),
+    "6": ("###", "#..", "###", "#.#", "###"),
+    "7": ("###", "..#", ".#.", ".#.", ".#."),
+    "8": ("###", "#.#", "###", "#.#", "###"),
+    "9": ("###", "#.#", "###", "..#", "###"),
+    "p": ("###", "#.#", "###", "#..", "#.."),
+    "t": (".#.", "###", ".#.", ".#.", ".##"),
+    ":": ("...", ".#.", "...", ".#.", "..."),
+    " ": ("...", "...", "...", "...", "..."),
+}
+_CHARS = "".join(_FONT_ROWS)
+# (n_glyphs, 5, 4): each glyph plus one column of spacing.
+_FONT = np.array(
+    [
+        [[row[c] == "#" for c in range(3)] + [False] for row in rows]
+        for rows in _FONT_ROWS.values()
+    ]
+)
+GLYPH_HEIGHT, GLYPH_WIDTH = 5, 4
+# matplotlib's 256-entry "gray" colormap as 8-bit levels: linspace(0, 1)
+# scaled by 255 and truncated, so a few levels are k - 1, not k.
+GRAY_LUT = (np.linspace(0.0, 1.0, 256) * 255).astype(np.uint8)
+
+
+def to_uint8(images: np.ndarray) -> np.ndarray:
+    """8-bit pixels from float [0, 1] images (as stored by 01_download.py) or uint8."""
+    if images.dtype == np.uint8:
+        return np.asarray(images)
+    pixels = np.clip(images, 0.0, 1.0) * 255.0
+    return np.rint(pixels).astype(np.uint8)
+
+
+def imsave_gray(images: np.ndarray) -> np.ndarray:
+    """(n, h, w) float32 images -> the (n, h, w, 4) RGBA pixels plt.imsave wrote.
+
+    Like matplotlib, each image is normalized to its own min..max in
+    float32 (all zeros if flat), binned into the 256 colormap entries and
+    looked up in GRAY_LUT, with alpha 255.
+    """
+    images = np.asarray(images, dtype=np.float32)
+    lo = images.min(axis=(1, 2), keepdims=True)
+    span = images.max(axis=(1, 2), keepdims=True) - lo
+    norm = (images - lo) / np.where(span > 0, span, np.float32(1.0))
+    index = (norm * np.float32(len(GRAY_LUT))).astype(np.intp)
+    np.minimum(index, len(GRAY_LUT) - 1, out=index)
+    rgba = np.empty(images.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = GRAY_LUT[index][..., None]
+    rgba[..., 3] = 255
+    return rgba
+
+
+def upscale(images: np.ndarray, factor: int) -> np.ndarray:
+    """Nearest-neighbour upscale of (n, h, w) images by an integer factor."""
+    return images.repeat(factor, axis=1).repeat(factor, axis=2)
+
+
+def render_text(texts: list[str], scale: int = 1) -> np.ndarray:
+    """Render equal-length strings as (n, 5 * scale, 4 * len * scale) uint8 bands."""
+    codes = np.array([[_CHARS.index(c) for c in text] for text in texts], dtype=np.intp)
+    n, length = codes.shape
+    glyphs = _FONT[codes]  # (n, length, 5, 4)
+    ink = glyphs.transpose(0, 2, 1, 3).reshape(n, GLYPH_HEIGHT, length * GLYPH_WIDTH)
+    bands = np.where(ink, INK, PAPER).astype(np.uint8)
+    return upscale(bands, scale)
+
+
+def captions(preds: np.ndarray, labels: np.ndarray) -> list[str]:
+    return [f"p:{int(p)} t:{int(t)}" for p, t in zip(preds, labels)]
+
+
+def thumbnails(
+    images: np.ndarray, texts: list[str], scale: int = 4, text_scale: int = 2
+) -> np.ndarray:
+    """(n, h, w) uint8 images -> (n, H, w * scale) thumbnails with a caption band."""
+    n, h, w = images.shape
+    body = upscale(images, scale)
+    width = w * scale
+    text = render_text(texts, text_scale)[:, :, :width]
+    margin = text_scale
+    band = np.full((n, text.shape[1] + 2 * margin, width), PAPER, dtype=np.uint8)
+    left = (width - text.shape[2]) // 2
+    band[:, margin : margin + text.shape[1], left : left + text.shape[2]] = text
+    return np.concatenate([band, body], axis=1)
+
+
+def grid_shape(n: int, columns: int = 0) -> tuple[int, int]:
+    """(rows, columns) of a near-square grid (or ``columns`` wide) for n tiles."""
+    cols = columns if columns > 0 else max(1, int(np.ceil(np.sqrt(n))))
+    cols = min(cols, max(1, n))
+    return -(-n // cols), cols
+
+
+def contact_sheet(tiles: np.ndarray, columns: int = 0, pad: int = 2) -> np.ndarray:
+    """Tile (n, h, w) images row-major into one image with ``pad`` pixel gutters."""
+    n, h, w = tiles.shape
+    rows, cols = grid_shape(n, columns)
+    cells = np.full((rows * cols, h + pad, w + pad), PAPER, dtype=np.uint8)
+    cells[:n, :h, :w] = tiles
+    sheet = cells.reshape(rows, cols, h + pad, w + pad).transpose(0, 2, 1, 3)
+    sheet = sheet.reshape(rows * (h + pad), cols * (w + pad))
+    # Trim the trailing gutters so the sheet has a border only between tiles.
+    return sheet[: rows * (h + pad) - pad, : cols * (w + pad) - pad]
+
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(tag + data)
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+
+def encode_png(pixels: np.ndarray, level: int = 6) -> bytes:
+    """PNG bytes for (h, w) grayscale, (h, w, 3) RGB or (h, w, 4) RGBA uint8 pixels."""
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    h, w = pixels.shape[:2]
+    color_type = 0 if pixels.ndim == 2 else {3: 2, 4: 6}[pixels.shape[2]]
+    # Each scanline starts with its filter type (0 = none).
+    raw = np.zeros((h, 1 + pixels[0].size), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(h, -1)
+    header = struct.pack(">IIBBBBB", w, h, 8, color_type, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + _chunk(b"IHDR", header)
+        + _chunk(b"IDAT", zlib.compress(raw.tobytes(), level))
+        + _chunk(b"IEND", b"")
+    )
+
+
+def write_png(path: str, pixels: np.ndarray) -> None:
+    with open(path, "wb") as f:
+        f.write(encode_png(pixels))
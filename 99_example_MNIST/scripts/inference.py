@@ -0,0 +1,146 @@
+"""Chunked inference and error analysis for the softmax model.
+
+``evaluate`` streams the test set in ``chunk_rows`` blocks (from a memmap
+or a ShardedDataset), so the only per-row temporaries are one chunk's
+float32 pixels and logits. In the same pass it accumulates:
+
+- ``preds``: the predicted class of every row (argmax, first index on ties)
+- ``confusion[true, pred]`` counts and the per-class ``precision``,
+  ``recall``, ``f1`` and ``support`` derived from them
+- ``topk_accuracy[k - 1]``: the fraction of rows whose true class is among
+  the k highest logits, with ties broken in index order as argmax does,
+  so ``topk_accuracy[0] == accuracy``
+- the ``n_hardest`` misclassified rows with the largest cross-entropy
+  (``hardest_index``/``_loss``/``_pred``/``_label``, hardest first)
+
+``save_evaluation`` writes everything to ``evaluation.npz`` plus small
+TSVs for reading by eye.
+"""
+import os
+
+import numpy as np
+
+from mnist_data import ShardedDataset, to_float32
+
+DEFAULT_CHUNK_ROWS = 8192
+
+
+def _chunks(X, chunk_rows: int):
+    if isinstance(X, ShardedDataset):
+        yield from X.iter_batches(chunk_rows, shuffle=False)
+        return
+    for start in range(0, X.shape[0], chunk_rows):
+        yield X[start : start + chunk_rows], None
+
+
+def evaluate(
+    W: np.ndarray,
+    b: np.ndarray,
+    X,
+    y: np.ndarray,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    top_k: int = 5,
+    n_hardest: int = 50,
+) -> dict:
+    n = len(y)
+    n_classes = W.shape[1]
+    top_k = min(top_k, n_classes)
+    preds = np.empty(n, dtype=np.int64)
+    confusion = np.zeros((n_classes, n_classes), dtype=np.int64)
+    rank_counts = np.zeros(n_classes, dtype=np.int64)
+    hard_index = np.empty(0, dtype=np.int64)
+    hard_loss = np.empty(0, dtype=np.float64)
+    columns = np.arange(n_classes)
+
+    start = 0
+    for X_chunk, _ in _chunks(X, chunk_rows):
+        rows = len(X_chunk)
+        stop = start + rows
+        y_chunk = np.asarray(y[start:stop])
+        logits = to_float32(X_chunk) @ W + b
+        pred = logits.argmax(axis=1)
+        preds[start:stop] = pred
+        confusion += np.bincount(
+            y_chunk * n_classes + pred, minlength=n_classes * n_classes
+        ).reshape(n_classes, n_classes)
+
+        # Rank of the true class: logits above it, plus equal ones at a
+        # lower index (argmax's tie-break).
+        true_logit = logits[np.arange(rows), y_chunk][:, None]
+        ahead = (logits > true_logit) | ((logits == true_logit) & (columns < y_chunk[:, None]))
+        rank_counts += np.bincount(ahead.sum(axis=1), minlength=n_classes)
+
+        wrong = np.flatnonzero(pred != y_chunk)
+        if len(wrong) and n_hardest > 0:
+            # Cross-entropy of the misclassified rows, via log-sum-exp.
+            z = logits[wrong].astype(np.float64)
+            z -= z.max(axis=1, keepdims=True)
+            loss = np.log(np.exp(z).sum(axis=1)) - z[np.arange(len(wrong)), y_chunk[wrong]]
+            hard_index = np.concatenate([hard_index, wrong + start])
+            hard_loss = np.concatenate([hard_loss, loss])
+            if len(hard_index) > n_hardest:
+                keep = np.argpartition(-hard_loss, n_hardest - 1)[:n_hardest]
+                hard_index, hard_loss = hard_index[keep], hard_loss[keep]
+        start = stop
+
+    order = np.lexsort((hard_index, -hard_loss))
+    hard_index, hard_loss = hard_index[order], hard_loss[order]
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    hits = np.diag(confusion)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = np.where(predicted > 0, hits / predicted, np.nan)
+        recall = np.where(support > 0, hits / support, np.nan)
+        f1 = 2 * precision * recall / (precision + recall)
+    topk_accuracy = np.cumsum(rank_counts)[:top_k] / max(n, 1)
+    return {
+        "n_samples": n,
+        "accuracy": float(hits.sum() / max(n, 1)),
+        "preds": preds,
+        "confusion": confusion,
+        "support": support,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "topk_accuracy": topk_accuracy,
+        "hardest_index": hard_index,
+        "hardest_loss": hard_loss,
+        "hardest_pred": preds[hard_index],
+        "hardest_label": np.asarray(y)[hard_index],
+    }
+
+
+def save_evaluation(result: dict, out_dir: str) -> None:
+    """evaluation.npz (all arrays except ``preds``) and per_class/confusion/topk/hardest TSVs."""
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {key: value for key, value in result.items() if key != "preds"}
+    np.savez_compressed(os.path.join(out_dir, "evaluation.npz"), **arrays)
+
+    n_classes = len(result["support"])
+    with open(os.path.join(out_dir, "per_class.tsv"), "w", encoding="utf-8") as f:
+        f.write("class\tsupport\tprecision\trecall\tf1\n")
+        for c in range(n_classes):
+            f.write(
+                f"{c}\t{result['support'][c]}\t{result['precision'][c]:.6f}\t"
+                f"{result['recall'][c]:.6f}\t{result['f1'][c]:.6f}\n"
+            )
+    with open(os.path.join(out_dir, "confusion.tsv"), "w", encoding="utf-8") as f:
+        f.write("true\\pred\t" + "\t".join(str(c) for c in range(n_classes)) + "\n")
+        for c, row in enumerate(result["confusion"]):
+            f.write(f"{c}\t" + "\t".join(str(v) for v in row) + "\n")
+    with open(os.path.join(out_dir, "topk.tsv"), "w", encoding="utf-8") as f:
+        f.write("k\taccuracy\n")
+        for k, acc in enumerate(result["topk_accuracy"], start=1):
+            f.write(f"{k}\t{acc:.6f}\n")
+    with open(os.path.join(out_dir, "hardest.tsv"), "w", encoding="utf-8") as f:
+        f.write("rank\tindex\tlabel\tpred\tloss\n")
+        for rank, (idx, label, pred, loss) in enumerate(
+            zip(
+                result["hardest_index"],
+                result["hardest_label"],
+                result["hardest_pred"],
+                result["hardest_loss"],
+            ),
+            start=1,
+        ):
+            f.write(f"{rank}\t{idx}\t{label}\t{pred}\t{loss:.6f}\n")
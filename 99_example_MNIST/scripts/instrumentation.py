@@ -0,0 +1,114 @@
+"""Stage timers, peak RSS and optional cProfile for the pipeline scripts.
+
+A script creates one ``RunTimer`` after parsing its arguments, wraps its
+phases in ``run.stage(name)`` and calls ``run.finish()`` once it is done:
+
+    run = RunTimer(args, args.model)
+    with run.stage("load"):
+        ...
+    run.finish()
+
+``finish`` writes ``<script>.timings.json`` next to the given output
+(``--timings`` overrides the path) with wall and CPU seconds for each
+stage and the whole run, and the peak RSS reached by the end of each
+stage. A stage entered repeatedly (e.g. once per epoch) accumulates and
+counts its calls. With ``--profile`` the run's main thread is also
+profiled and the cProfile stats go to ``<script>.timings.prof`` beside
+the JSON (``python -m pstats`` reads them). A run that raises writes
+neither. 98_timings_html.py aggregates the JSON files of a pipeline run.
+"""
+import argparse
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from typing import Iterator
+
+from file_utils import atomic_write
+
+TIMINGS_SUFFIX = ".timings.json"
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--timings",
+        default=None,
+        help=f"Per-stage timing JSON (default: <script>{TIMINGS_SUFFIX} next to the output)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Also dump cProfile stats next to the timing JSON",
+    )
+
+
+class RunTimer:
+    def __init__(self, args: argparse.Namespace, output: str) -> None:
+        self.script = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        self.path = args.timings or os.path.join(
+            os.path.dirname(os.path.abspath(os.path.normpath(output))),
+            self.script + TIMINGS_SUFFIX,
+        )
+        self.stages: dict[str, dict] = {}
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._profiler = None
+        if args.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(
+                name, {"seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+            )
+            entry["seconds"] += time.perf_counter() - start
+            entry["cpu_seconds"] += time.process_time() - cpu_start
+            entry["calls"] += 1
+            entry["peak_rss_mb"] = peak_rss_mb()
+
+    def finish(self) -> None:
+        if self._profiler is not None:
+            self._profiler.disable()
+        report = {
+            "script": self.script,
+            "argv": sys.argv[1:],
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seconds": time.perf_counter() - self._start,
+            "cpu_seconds": time.process_time() - self._cpu_start,
+            "peak_rss_mb": peak_rss_mb(),
+            # Worker processes (02_train_model.py --workers), if any.
+            "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+            "stages": [{"name": name, **entry} for name, entry in self.stages.items()],
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with atomic_write(self.path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        if self._profiler is not None:
+            self._profiler.dump_stats(os.path.splitext(self.path)[0] + ".prof")
+
+
+def load_timings(paths: list[str]) -> list[dict]:
+    """Read timing JSON files, skipping ones that are not valid JSON."""
+    reports = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return reports
@@ -0,0 +1,125 @@
+"""Binary float32 matrix files shared by 10_export_train_tsv.py and 11_jackstraw.R.
+
+Layout (``.f32``):
+
+- 8 bytes: the magic ``F32MAT01``
+- uint32, little-endian: header length in bytes
+- the header: UTF-8 JSON such as ``{"dtype": "<f4", "shape": [5000, 784],
+  "order": "C"}``, padded with spaces so the data starts on a 64-byte
+  boundary
+- the data: rows * cols little-endian float32 values, row-major
+
+R reads it with readBin (see ``read_f32_matrix`` in 11_jackstraw.R) and
+numpy with ``read_f32_matrix`` below, as a memory map.
+
+``write_tsv_matrix`` writes the same matrix as text, byte for byte what
+``np.savetxt(path, to_float32(X), fmt="%.6f", delimiter="\\t")`` writes,
+one block of rows at a time. Pixels stored by 01_download.py are k/255,
+so a block whose float32 bits all match one of those 256 values is built
+from a table of their formatted bytes with no per-value Python work. Any
+other block goes through a single ``%`` over the whole block. A path
+ending in ``.gz`` is gzip-compressed, with the mtime fixed to 0 so
+identical data gives identical files.
+"""
+import gzip
+import json
+import os
+import struct
+
+import numpy as np
+
+from file_utils import atomic_write
+from mnist_data import to_float32
+
+F32_MAGIC = b"F32MAT01"
+F32_ALIGN = 64
+WRITE_CHUNK_ROWS = 8192
+TSV_CHUNK_ROWS = 1024
+TSV_FMT = "%.6f"
+# The TSV compresses about as well at level 1 as at 9, and 20x faster.
+GZIP_LEVEL = 1
+
+
+def write_f32_matrix(path: str, X: np.ndarray, chunk_rows: int = WRITE_CHUNK_ROWS) -> None:
+    """Write a (rows, cols) matrix, converting to float32 a chunk at a time."""
+    rows, cols = X.shape
+    header = json.dumps({"dtype": "<f4", "shape": [rows, cols], "order": "C"})
+    prefix = len(F32_MAGIC) + 4
+    header_len = -(-(prefix + len(header)) // F32_ALIGN) * F32_ALIGN - prefix
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with atomic_write(path) as f:
+        f.write(F32_MAGIC)
+        f.write(struct.pack("<I", header_len))
+        f.write(header.ljust(header_len).encode("utf-8"))
+        for start in range(0, rows, chunk_rows):
+            chunk = to_float32(X[start : start + chunk_rows])
+            f.write(chunk.astype("<f4", copy=False).tobytes())
+
+
+def read_f32_header(path: str) -> tuple[dict, int]:
+    """Return the JSON header and the byte offset of the data."""
+    with open(path, "rb") as f:
+        magic = f.read(len(F32_MAGIC))
+        if magic != F32_MAGIC:
+            raise ValueError(f"{path} is not an F32MAT01 file")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    return header, len(F32_MAGIC) + 4 + header_len
+
+
+def read_f32_matrix(path: str) -> np.ndarray:
+    header, offset = read_f32_header(path)
+    return np.memmap(path, dtype="<f4", mode="r", offset=offset, shape=tuple(header["shape"]))
+
+
+def _pixel_table() -> tuple[np.ndarray, np.ndarray | None]:
+    """float32 bits of k/255 for k = 0..255 and their formatted bytes (None if widths differ)."""
+    values = to_float32(np.arange(256, dtype=np.uint8))
+    texts = [(TSV_FMT % v).encode("ascii") for v in values.tolist()]
+    if len({len(text) for text in texts}) != 1:
+        return values.view(np.uint32), None
+    table = np.frombuffer(b"".join(texts), dtype=np.uint8).reshape(256, -1)
+    return values.view(np.uint32), table
+
+
+def _format_pixel_block(block: np.ndarray, bits: np.ndarray, table: np.ndarray) -> bytes | None:
+    """The TSV bytes of a block of k/255 values, or None if any value is not one."""
+    k = np.rint(block * 255.0)
+    if not np.all((k >= 0) & (k <= 255)):
+        return None
+    k = k.astype(np.uint8)
+    if not np.array_equal(bits[k], block.view(np.uint32)):
+        return None
+    rows, cols = block.shape
+    width = table.shape[1]
+    out = np.empty((rows, cols, width + 1), dtype=np.uint8)
+    out[:, :, :width] = table[k]
+    out[:, :, width] = ord("\t")
+    out[:, -1, width] = ord("\n")
+    return out.tobytes()
+
+
+def write_tsv_matrix(path: str, X: np.ndarray, chunk_rows: int = TSV_CHUNK_ROWS) -> None:
+    """Write X as float32 "%.6f" TSV (gzip if ``path`` ends in .gz), identical to np.savetxt."""
+    rows, cols = X.shape
+    bits, table = _pixel_table()
+    row_fmt = "\t".join([TSV_FMT] * cols) + "\n"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with atomic_write(path) as raw:
+        out = (
+            gzip.GzipFile(filename="", mode="wb", compresslevel=GZIP_LEVEL, fileobj=raw, mtime=0)
+            if path.endswith(".gz")
+            else raw
+        )
+        try:
+            for start in range(0, rows, chunk_rows):
+                block = np.ascontiguousarray(to_float32(X[start : start + chunk_rows]))
+                data = None
+                if table is not None and cols > 0:
+                    data = _format_pixel_block(block, bits, table)
+                if data is None:
+                    data = ((row_fmt * len(block)) % tuple(block.ravel().tolist())).encode("ascii")
+                out.write(data)
+        finally:
+            if out is not raw:
+                out.close()
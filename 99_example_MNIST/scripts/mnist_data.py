@@ -0,0 +1,234 @@
+"""Shared loaders for the image arrays written by 01_download.py.
+
+Images are stored either as float32 in [0, 1] or, with
+``01_download.py --storage uint8``, as the raw uint8 pixels (4x smaller).
+``load_images`` memory-maps either kind without reading it, and
+``to_float32`` converts just the rows a step is about to use. uint8 pixels
+convert to exactly the float32 values the float32 storage holds, so results
+do not depend on the storage mode.
+
+``write_shards``/``ShardedDataset`` store a split as fixed-size ``.npy``
+shards plus an ``index.json`` (row offsets, label histograms, SHA-256 of
+every file), so a step can work through data larger than memory while
+holding at most ``cache_shards`` shards at a time.
+"""
+from collections import OrderedDict
+import glob
+import json
+import os
+from typing import Iterator
+
+import numpy as np
+
+from file_utils import atomic_write, sha256_file
+
+SHARD_INDEX = "index.json"
+SHARD_FORMAT_VERSION = 1
+DEFAULT_SHARD_SIZE = 10000
+
+
+def load_images(path: str) -> np.ndarray:
+    return np.load(path, mmap_mode="r")
+
+
+def to_float32(images: np.ndarray) -> np.ndarray:
+    if images.dtype == np.float32:
+        return np.asarray(images)
+    out = images.astype(np.float32)
+    np.divide(out, 255.0, out=out)
+    return out
+
+
+def write_shards(
+    out_dir: str, X: np.ndarray, y: np.ndarray, shard_size: int = DEFAULT_SHARD_SIZE
+) -> dict:
+    """Split ``X``/``y`` into shards of ``shard_size`` rows under ``out_dir``.
+
+    The index is written last (atomically), so a directory without one is
+    an interrupted write and is never read.
+    """
+    if len(X) != len(y):
+        raise ValueError(f"{len(X)} images but {len(y)} labels")
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, SHARD_INDEX)
+    for stale in [index_path] + glob.glob(os.path.join(out_dir, "shard-*.npy")):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    num_classes = int(y.max()) + 1 if len(y) else 0
+    shards = []
+    for i, start in enumerate(range(0, len(X), shard_size)):
+        stop = min(start + shard_size, len(X))
+        labels = np.asarray(y[start:stop])
+        names = {"x": f"shard-{i:05d}.X.npy", "y": f"shard-{i:05d}.y.npy"}
+        np.save(os.path.join(out_dir, names["x"]), np.ascontiguousarray(X[start:stop]))
+        np.save(os.path.join(out_dir, names["y"]), labels)
+        shards.append(
+            {
+                **names,
+                "offset": start,
+                "count": stop - start,
+                "label_counts": np.bincount(labels, minlength=num_classes).tolist(),
+                "sha256": {
+                    key: sha256_file(os.path.join(out_dir, name))
+                    for key, name in names.items()
+                },
+            }
+        )
+
+    index = {
+        "version": SHARD_FORMAT_VERSION,
+        "count": len(X),
+        "n_features": int(X.shape[1]),
+        "dtype": str(X.dtype),
+        "label_dtype": str(y.dtype),
+        "shard_size": shard_size,
+        "num_classes": num_classes,
+        "label_counts": np.bincount(np.asarray(y), minlength=num_classes).tolist(),
+        "shards": shards,
+    }
+    with atomic_write(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    return index
+
+
+class ShardedDataset:
+    """Read a directory written by ``write_shards``.
+
+    ``take`` gives random access by global row index and
+    ``iter_batches`` walks the rows in (optionally shuffled) batches. Both
+    load whole shards and keep at most ``cache_shards`` of them in memory.
+    Images come back in their stored dtype; pass them through
+    ``to_float32``.
+    """
+
+    def __init__(self, path: str, cache_shards: int = 4) -> None:
+        with open(os.path.join(path, SHARD_INDEX), "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        if self.index.get("version") != SHARD_FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard format in {path}")
+        self.path = path
+        self.shards = self.index["shards"]
+        self.offsets = np.array(
+            [shard["offset"] for shard in self.shards] + [self.index["count"]]
+        )
+        self.cache_shards = max(1, cache_shards)
+        self._cache: OrderedDict[int, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+        self._labels: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return self.index["count"]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.index["count"], self.index["n_features"])
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self.index["dtype"])
+
+    @property
+    def labels(self) -> np.ndarray:
+        """All labels, read from the small per-shard label files only."""
+        if self._labels is None:
+            parts = [
+                np.load(os.path.join(self.path, shard["y"])) for shard in self.shards
+            ]
+            self._labels = (
+                np.concatenate(parts)
+                if parts
+                else np.empty(0, dtype=self.index["label_dtype"])
+            )
+        return self._labels
+
+    def verify(self) -> None:
+        """Raise ValueError if any shard file does not match its checksum."""
+        for shard in self.shards:
+            for key in ("x", "y"):
+                path = os.path.join(self.path, shard[key])
+                if sha256_file(path) != shard["sha256"][key]:
+                    raise ValueError(f"Checksum mismatch for {path}")
+
+    def _load(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        shard = self.shards[i]
+        return (
+            np.load(os.path.join(self.path, shard["x"])),
+            np.load(os.path.join(self.path, shard["y"])),
+        )
+
+    def shard(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        cached = self._cache.get(i)
+        if cached is not None:
+            self._cache.move_to_end(i)
+            return cached
+        cached = self._load(i)
+        self._cache[i] = cached
+        while len(self._cache) > self.cache_shards:
+            self._cache.popitem(last=False)
+        return cached
+
+    def take(self, idx) -> tuple[np.ndarray, np.ndarray]:
+        """Rows ``idx`` (global indices, any order) as ``(X, y)``.
+
+        Indices are grouped by shard so each shard is loaded at most once.
+        """
+        idx = np.asarray(idx, dtype=np.int64)
+        if idx.size and (idx.min() < 0 or idx.max() >= len(self)):
+            raise IndexError(f"index out of range for dataset of size {len(self)}")
+        X = np.empty((len(idx), self.index["n_features"]), dtype=self.dtype)
+        y = np.empty(len(idx), dtype=self.index["label_dtype"])
+        shard_ids = np.searchsorted(self.offsets, idx, side="right") - 1
+        order = np.argsort(shard_ids, kind="stable")
+        sorted_ids = shard_ids[order]
+        bounds = np.flatnonzero(np.diff(sorted_ids)) + 1
+        for positions in np.split(order, bounds):
+            if not len(positions):
+                continue
+            sid = int(shard_ids[positions[0]])
+            X_shard, y_shard = self.shard(sid)
+            local = idx[positions] - self.offsets[sid]
+            X[positions] = X_shard[local]
+            y[positions] = y_shard[local]
+        return X, y
+
+    def __getitem__(self, i: int) -> tuple[np.ndarray, int]:
+        X, y = self.take([i])
+        return X[0], y[0]
+
+    def iter_batches(
+        self,
+        batch_size: int,
+        rng: np.random.Generator | None = None,
+        shuffle: bool = True,
+    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """Yield ``(X, y)`` batches covering every row once.
+
+        With ``shuffle`` the shard order is permuted, and rows are shuffled
+        within a window of ``cache_shards`` shards; rows left over at the
+        end of a window are carried into the next one, so only the final
+        batch can be short. Windows are read through the same cache as
+        ``take``, so a dataset of at most ``cache_shards`` shards is read
+        from disk once and not again on later epochs.
+        """
+        if shuffle and rng is None:
+            rng = np.random.default_rng()
+        n_shards = len(self.shards)
+        shard_order = rng.permutation(n_shards) if shuffle else np.arange(n_shards)
+        X_rest = np.empty((0, self.index["n_features"]), dtype=self.dtype)
+        y_rest = np.empty(0, dtype=self.index["label_dtype"])
+        for start in range(0, n_shards, self.cache_shards):
+            window = [self.shard(int(i)) for i in shard_order[start : start + self.cache_shards]]
+            X_win = np.concatenate([X_rest] + [X for X, _ in window])
+            y_win = np.concatenate([y_rest] + [y for _, y in window])
+            del window
+            if shuffle:
+                perm = rng.permutation(len(y_win))
+                X_win = X_win[perm]
+                y_win = y_win[perm]
+            n_full = len(y_win) - len(y_win) % batch_size
+            for b in range(0, n_full, batch_size):
+                yield X_win[b : b + batch_size], y_win[b : b + batch_size]
+            X_rest = X_win[n_full:].copy()
+            y_rest = y_win[n_full:].copy()
+        if len(y_rest):
+            yield X_rest, y_rest
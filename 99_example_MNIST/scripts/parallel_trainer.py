@@ -0,0 +1,216 @@
+"""Data-parallel SGD for 02_train_model.py (``--workers N``).
+
+``W``/``b``, the current batch's row indices and one gradient buffer per
+worker live in ``multiprocessing.shared_memory``. Each step the parent
+writes the batch's row indices, releases the workers, and waits. Worker
+``i`` gathers its contiguous slice of the batch straight from the
+memory-mapped training files and writes that slice's gradients (scaled by
+the full batch size) into its own buffer. The parent then sums the
+buffers in worker order and updates ``W``/``b`` in place, where every
+worker sees them.
+
+Every worker runs its BLAS with ``blas_threads`` threads (1 by default),
+so N workers use N cores instead of oversubscribing the node.
+
+A run is deterministic for a fixed seed and worker count. With more than
+one worker, the batch gradient is summed in a different order than in a
+single process, so weights agree with a single-process run to float32
+rounding rather than bit for bit (tests/test_parallel_trainer.py allows
+1e-6). bench_parallel_trainer.py reports the difference.
+"""
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+import threading
+
+import numpy as np
+
+from mnist_data import load_images, to_float32
+from softmax_trainer import SoftmaxSGD
+
+BLAS_THREAD_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+# Seconds a step may take before a wedged worker is assumed.
+STEP_TIMEOUT = 600.0
+_STOP = -1
+
+
+def _shared_array(shape, dtype, blocks: list):
+    dtype = np.dtype(dtype)
+    size = max(1, int(np.prod(shape)) * dtype.itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    blocks.append(shm)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf), shm.name
+
+
+def _attach(name: str, shape, dtype, blocks: list) -> np.ndarray:
+    # Spawned workers share the parent's resource tracker, so the blocks
+    # stay registered once and are cleaned up if the parent dies.
+    shm = shared_memory.SharedMemory(name=name)
+    blocks.append(shm)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _worker(rank: int, n_workers: int, spec: dict, start, done) -> None:
+    blocks: list = []
+    try:
+        _worker_loop(rank, n_workers, spec, start, done, blocks)
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        start.abort()
+        done.abort()
+        raise
+    finally:
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # still referenced by a traceback; the OS unmaps it
+
+
+def _worker_loop(
+    rank: int, n_workers: int, spec: dict, start, done, blocks: list
+) -> None:
+    X = load_images(spec["x_path"])
+    y = np.load(spec["y_path"], mmap_mode="r")
+    F, C, B = spec["n_features"], spec["n_classes"], spec["max_batch"]
+    W = _attach(spec["W"], (F, C), np.float32, blocks)
+    b = _attach(spec["b"], (C,), np.float32, blocks)
+    ctrl = _attach(spec["ctrl"], (1,), np.int64, blocks)
+    rows = _attach(spec["rows"], (B,), np.int64, blocks)
+    grad_W = _attach(spec["grad_W"], (n_workers, F, C), np.float32, blocks)[rank]
+    grad_b = _attach(spec["grad_b"], (n_workers, C), np.float32, blocks)[rank]
+    kernel = SoftmaxSGD(W, b, -(-B // n_workers))
+    while True:
+        start.wait()
+        n = int(ctrl[0])
+        if n == _STOP:
+            return
+        lo, hi = rank * n // n_workers, (rank + 1) * n // n_workers
+        idx = rows[lo:hi]
+        if hi > lo:
+            kernel.gradients(to_float32(X[idx]), y[idx], n, grad_W, grad_b)
+        else:
+            grad_W[...] = 0
+            grad_b[...] = 0
+        done.wait()
+
+
+class DataParallelSGD:
+    """Train ``W``/``b`` (copied into shared memory) on rows of ``x_path``.
+
+    Use as a context manager. ``W`` and ``b`` always hold the current
+    weights; ``close`` turns them from shared-memory views into copies.
+    """
+
+    def __init__(
+        self,
+        x_path: str,
+        y_path: str,
+        W: np.ndarray,
+        b: np.ndarray,
+        max_batch: int,
+        workers: int,
+        blas_threads: int = 1,
+    ) -> None:
+        self.workers = workers
+        self._blocks: list = []
+        F, C = W.shape
+        self.W, W_name = _shared_array((F, C), np.float32, self._blocks)
+        self.b, b_name = _shared_array((C,), np.float32, self._blocks)
+        self._ctrl, ctrl_name = _shared_array((1,), np.int64, self._blocks)
+        self._rows, rows_name = _shared_array((max_batch,), np.int64, self._blocks)
+        self._grad_W, grad_W_name = _shared_array(
+            (workers, F, C), np.float32, self._blocks
+        )
+        self._grad_b, grad_b_name = _shared_array((workers, C), np.float32, self._blocks)
+        self.W[...] = W
+        self.b[...] = b
+        # Only apply() is used here; the workers compute the gradients.
+        self._update = SoftmaxSGD(self.W, self.b, 1)
+        spec = {
+            "x_path": x_path,
+            "y_path": y_path,
+            "n_features": F,
+            "n_classes": C,
+            "max_batch": max_batch,
+            "W": W_name,
+            "b": b_name,
+            "ctrl": ctrl_name,
+            "rows": rows_name,
+            "grad_W": grad_W_name,
+            "grad_b": grad_b_name,
+        }
+
+        # spawn, not fork: a forked child inherits the parent's already
+        # initialized BLAS thread pool, which can deadlock.
+        ctx = mp.get_context("spawn")
+        self._start = ctx.Barrier(workers + 1)
+        self._done = ctx.Barrier(workers + 1)
+        saved = {var: os.environ.get(var) for var in BLAS_THREAD_VARS}
+        os.environ.update({var: str(blas_threads) for var in BLAS_THREAD_VARS})
+        try:
+            self._procs = [
+                ctx.Process(
+                    target=_worker,
+                    args=(rank, workers, spec, self._start, self._done),
+                    name=f"sgd-worker-{rank}",
+                    daemon=True,
+                )
+                for rank in range(workers)
+            ]
+            for proc in self._procs:
+                proc.start()
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+
+    def step(self, rows: np.ndarray, lr: float) -> None:
+        """One SGD step on the training rows ``rows`` (global indices)."""
+        n = len(rows)
+        self._rows[:n] = rows
+        self._ctrl[0] = n
+        try:
+            self._start.wait(STEP_TIMEOUT)
+            self._done.wait(STEP_TIMEOUT)
+        except threading.BrokenBarrierError:
+            raise RuntimeError("a training worker failed (see its traceback)") from None
+        self._grad_W.sum(axis=0, out=self._update.grad_W)
+        self._grad_b.sum(axis=0, out=self._update.grad_b)
+        self._update.apply(lr)
+
+    def close(self) -> None:
+        if self._procs:
+            self._ctrl[0] = _STOP
+            try:
+                self._start.wait(STEP_TIMEOUT)
+            except threading.BrokenBarrierError:
+                pass
+            for proc in self._procs:
+                proc.join(timeout=10)
+                if proc.is_alive():
+                    proc.terminate()
+            self._procs = []
+        self.W = np.array(self.W)
+        self.b = np.array(self.b)
+        self._ctrl = self._rows = self._grad_W = self._grad_b = self._update = None
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "DataParallelSGD":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
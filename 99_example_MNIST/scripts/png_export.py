@@ -0,0 +1,126 @@
+"""Incremental, optionally parallel PNG export for 04_show_images.py and
+04_test_examples.py.
+
+``export_pngs`` writes ``pixels[i]`` to ``out_dir/names[i]`` unless the
+file exists and the SHA-256 of its pixels matches the one recorded in the
+out-dir's ``manifest.json`` by the previous run. ``.png`` files that are
+no longer wanted are deleted, so re-runs only touch what changed. Each
+file is written to a temporary name and moved into place. The skipping
+only helps direct runs of the scripts: Snakemake deletes a job's
+``directory()`` output before running it, manifest included.
+
+With ``jobs > 1`` and at least ``POOL_MIN_IMAGES`` changed images, the
+pixel batch is copied once into ``multiprocessing.shared_memory``. A
+``ProcessPoolExecutor`` then encodes slices of the changed images: each
+task attaches to the block by name and receives only indices and file
+names, never pickled pixels.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+from file_utils import atomic_write
+from image_render import encode_png
+
+MANIFEST = "manifest.json"
+# Part of every hash, so a change to the encoder output rewrites all files.
+ENCODING_VERSION = b"png-v1"
+# A thumbnail encodes in about 2 ms, while each spawned worker pays about
+# a second re-importing numpy, so smaller batches are encoded in-process.
+POOL_MIN_IMAGES = 500
+
+
+def pixel_hash(pixels: np.ndarray) -> str:
+    digest = hashlib.sha256(ENCODING_VERSION)
+    digest.update(repr(pixels.shape).encode())
+    digest.update(np.ascontiguousarray(pixels, dtype=np.uint8).tobytes())
+    return digest.hexdigest()
+
+
+def previous_hashes(out_dir: str) -> dict[str, str]:
+    """file name -> sha256 from the out-dir's manifest ({} if missing or unreadable)."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return {entry["file"]: entry["sha256"] for entry in manifest["images"]}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def write_manifest(out_dir: str, manifest: dict) -> None:
+    with atomic_write(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _write_png(path: str, pixels: np.ndarray) -> None:
+    with atomic_write(path) as f:
+        f.write(encode_png(pixels))
+
+
+def _encode_slice(shm_name: str, shape, out_dir: str, items) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        for i, name in items:
+            _write_png(os.path.join(out_dir, name), pixels[i])
+        del pixels
+    finally:
+        shm.close()
+
+
+def export_pngs(
+    out_dir: str, names: list[str], pixels: np.ndarray, jobs: int = 1
+) -> tuple[list[str], int]:
+    """Write the images that changed.
+
+    Returns every image's hash and the number of files written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    hashes = [pixel_hash(image) for image in pixels]
+    previous = previous_hashes(out_dir)
+
+    wanted = set(names)
+    for name in os.listdir(out_dir):
+        if name.lower().endswith(".png") and name not in wanted:
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except OSError:
+                pass
+
+    changed = [
+        (i, name)
+        for i, (name, digest) in enumerate(zip(names, hashes))
+        if previous.get(name) != digest
+        or not os.path.exists(os.path.join(out_dir, name))
+    ]
+    if jobs <= 1 or len(changed) < POOL_MIN_IMAGES:
+        for i, name in changed:
+            _write_png(os.path.join(out_dir, name), pixels[i])
+        return hashes, len(changed)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, pixels.nbytes))
+    try:
+        shared = np.ndarray(pixels.shape, dtype=np.uint8, buffer=shm.buf)
+        shared[...] = pixels
+        del shared
+        # A few tasks per worker keeps the pool busy when image sizes vary.
+        n_tasks = min(len(changed), jobs * 4)
+        slices = [changed[k::n_tasks] for k in range(n_tasks)]
+        # spawn, as in parallel_trainer: never fork a process with a live BLAS pool.
+        with ProcessPoolExecutor(jobs, mp_context=mp.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_encode_slice, shm.name, pixels.shape, out_dir, items)
+                for items in slices
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        shm.close()
+        shm.unlink()
+    return hashes, len(changed)
@@ -0,0 +1,97 @@
+"""Allocation-free SGD step for 02_train_model.py's softmax regression.
+
+``SoftmaxSGD.step`` does the forward pass, the softmax and the
+cross-entropy gradient in one reused ``(batch, classes)`` buffer, and
+writes the weight gradients into preallocated arrays with ``out=`` ufuncs.
+Apart from a few array views it allocates nothing per step. Every
+operation is the same float32 operation, in the same order, as the original
+expression-style loop, so the weights come out bit-identical (checked by
+tests/test_softmax_trainer.py; ``bench_softmax_trainer.py`` times it).
+"""
+import numpy as np
+
+# Batch size from which _row_max beats ndarray.max(axis=1).
+COLUMN_MAX_MIN_BATCH = 128
+
+
+class SoftmaxSGD:
+    def __init__(self, W: np.ndarray, b: np.ndarray, max_batch: int) -> None:
+        # W and b are updated in place.
+        self.W = W
+        self.b = b
+        n_classes = W.shape[1]
+        self._probs = np.empty((max_batch, n_classes), dtype=W.dtype)
+        self._row = np.empty((max_batch, 1), dtype=W.dtype)
+        # Flat offset of each row's first class in ``_probs``.
+        self._row_offsets = np.arange(max_batch, dtype=np.intp) * n_classes
+        self._target = np.empty(max_batch, dtype=np.intp)
+        self._picked = np.empty(max_batch, dtype=W.dtype)
+        self.grad_W = np.empty_like(W)
+        self.grad_b = np.empty_like(b)
+
+    def step(self, X: np.ndarray, y: np.ndarray, lr: float) -> None:
+        self.gradients(X, y)
+        self.apply(lr)
+
+    def gradients(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        batch_size: int | None = None,
+        grad_W: np.ndarray | None = None,
+        grad_b: np.ndarray | None = None,
+    ) -> None:
+        """Mean cross-entropy gradients for ``X``/``y`` into ``grad_W``/``grad_b``.
+
+        ``batch_size`` is the size of the whole batch when ``X`` is only a
+        slice of it (data-parallel workers), so the slices' gradients sum to
+        the batch's. The outputs default to ``self.grad_W``/``self.grad_b``.
+        """
+        n = len(y)
+        batch_size = n if batch_size is None else batch_size
+        grad_W = self.grad_W if grad_W is None else grad_W
+        grad_b = self.grad_b if grad_b is None else grad_b
+        probs = self._probs[:n]
+        row = self._row[:n]
+
+        # logits = X @ W + b
+        np.matmul(X, self.W, out=probs)
+        probs += self.b
+        # softmax, in place (ndarray methods skip np.* wrapper overhead,
+        # which matters at small batch sizes)
+        if n >= COLUMN_MAX_MIN_BATCH:
+            self._row_max(probs, row)
+        else:
+            probs.max(axis=1, keepdims=True, out=row)
+        probs -= row
+        np.exp(probs, out=probs)
+        probs.sum(axis=1, keepdims=True, out=row)
+        probs /= row
+        # d(mean cross-entropy)/d(logits) = (probs - onehot(y)) / n
+        target = self._target[:n]
+        picked = self._picked[:n]
+        flat = probs.reshape(-1)
+        np.add(self._row_offsets[:n], y, out=target)
+        flat.take(target, out=picked)
+        picked -= 1
+        flat.put(target, picked)
+        probs /= batch_size
+
+        np.matmul(X.T, probs, out=grad_W)
+        probs.sum(axis=0, out=grad_b)
+
+    def apply(self, lr: float) -> None:
+        """Take an SGD step along ``self.grad_W``/``self.grad_b``."""
+        self.grad_W *= lr
+        self.W -= self.grad_W
+        self.grad_b *= lr
+        self.b -= self.grad_b
+
+    @staticmethod
+    def _row_max(probs: np.ndarray, row: np.ndarray) -> None:
+        # Row-wise max as an elementwise maximum over the class columns.
+        # max is exact, so this equals probs.max(axis=1), but it avoids
+        # numpy's slow reduction over a 10-wide inner axis.
+        np.maximum(probs[:, 0:1], probs[:, 1:2], out=row)
+        for j in range(2, probs.shape[1]):
+            np.maximum(row, probs[:, j : j + 1], out=row)
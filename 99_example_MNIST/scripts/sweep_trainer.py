@@ -0,0 +1,87 @@
+"""Train M softmax-regression configurations at once (02_train_model.py --sweep-lr).
+
+All configurations see the same batches and differ only in learning rate,
+so their weights are stacked and each step is two GEMMs for all of them:
+``W`` is laid out as ``(n_features, M, classes)``, so the forward pass is
+``X @ W.reshape(n_features, M * classes)`` and the weight gradient is
+``X.T @ G`` with ``G`` shaped ``(batch, M * classes)``. ``weights(m)``
+returns configuration ``m``'s ``(n_features, classes)`` matrix.
+
+Each configuration follows the same update as a standalone
+``SoftmaxSGD`` run with its learning rate, up to float32 rounding (GEMM
+shapes and the order of a few scalings differ).
+"""
+import numpy as np
+
+# Shifted logits are clipped here before exp. Configs with a large lr push
+# many probabilities below float32's normal range, and subnormal arithmetic
+# slowed whole steps down several-fold; exp(-60) ~ 1e-26 changes nothing
+# visible in float32.
+LOGIT_FLOOR = -60.0
+
+
+class StackedSoftmaxSGD:
+    def __init__(self, W: np.ndarray, b: np.ndarray, lrs, max_batch: int) -> None:
+        # Every configuration starts from the same W (n_features, classes)
+        # and b (classes,).
+        self.lrs = np.asarray(lrs, dtype=W.dtype)
+        M = len(self.lrs)
+        F, C = W.shape
+        self.W = np.empty((F, M, C), dtype=W.dtype)
+        self.W[...] = W[:, None, :]
+        self.b = np.empty((M, C), dtype=b.dtype)
+        self.b[...] = b
+        self._W2 = self.W.reshape(F, M * C)
+        self._b2 = self.b.reshape(M * C)
+        self._probs = np.empty((max_batch, M * C), dtype=W.dtype)
+        self._row = np.empty((max_batch, M, 1), dtype=W.dtype)
+        self._grad_W = np.empty_like(self._W2)
+        self._grad_b = np.empty_like(self.b)
+
+    def weights(self, m: int) -> tuple[np.ndarray, np.ndarray]:
+        return self.W[:, m, :].copy(), self.b[m].copy()
+
+    def _softmax(self, logits: np.ndarray, row: np.ndarray) -> np.ndarray:
+        # logits: (n, M * C) -> probabilities over each config's classes.
+        # The max/sum over the 10 classes are elementwise ops across class
+        # columns; numpy's reduction over such a short axis is far slower.
+        n = logits.shape[0]
+        probs = logits.reshape(n, len(self.lrs), -1)
+        C = probs.shape[2]
+        np.maximum(probs[:, :, 0:1], probs[:, :, 1:2], out=row)
+        for j in range(2, C):
+            np.maximum(row, probs[:, :, j : j + 1], out=row)
+        probs -= row
+        np.maximum(probs, LOGIT_FLOOR, out=probs)
+        np.exp(probs, out=probs)
+        np.add(probs[:, :, 0:1], probs[:, :, 1:2], out=row)
+        for j in range(2, C):
+            row += probs[:, :, j : j + 1]
+        probs /= row
+        return probs
+
+    def step(self, X: np.ndarray, y: np.ndarray) -> None:
+        n = len(y)
+        logits = self._probs[:n]
+        np.matmul(X, self._W2, out=logits)
+        logits += self._b2
+        probs = self._softmax(logits, self._row[:n])
+        probs[np.arange(n), :, y] -= 1
+        # Fold each config's lr / n into the (small) logit gradient rather
+        # than scaling the (n_features x M x C) weight gradient.
+        probs *= (self.lrs / n)[None, :, None]
+
+        np.matmul(X.T, logits, out=self._grad_W)
+        probs.sum(axis=0, out=self._grad_b)
+        self._W2 -= self._grad_W
+        self.b -= self._grad_b
+
+    def evaluate(self, X: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Per-configuration mean cross-entropy and accuracy, each shape (M,)."""
+        n = len(y)
+        logits = X @ self._W2 + self._b2
+        predictions = logits.reshape(n, len(self.lrs), -1).argmax(axis=2)
+        accuracy = (predictions == y[:, None]).mean(axis=0)
+        probs = self._softmax(logits, np.empty((n, len(self.lrs), 1), dtype=logits.dtype))
+        loss = -np.mean(np.log(probs[np.arange(n), :, y] + 1e-9), axis=0)
+        return loss, accuracy
@@ -0,0 +1,35 @@
+"""Training checkpoints for 02_train_model.py (``--checkpoint``/``--resume``).
+
+A checkpoint is a single .npz. It holds the arrays (weights, the composed
+epoch permutation, the best weights so far) and a JSON ``meta`` entry with
+everything else: RNG state, epoch/batch cursor, metrics rows so far and
+the run's config. It is written to a temporary file next to the target,
+fsynced and moved into place with ``os.replace``, so a job killed mid-write
+leaves the previous checkpoint intact.
+"""
+import json
+import os
+
+import numpy as np
+
+from file_utils import atomic_write
+
+
+def file_stamp(path: str) -> list:
+    """(size, mtime) of an input file; a changed input invalidates a checkpoint."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def save_checkpoint(path: str, arrays: dict, meta: dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with atomic_write(path, fsync=True) as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_checkpoint(path: str) -> tuple[dict, dict]:
+    """Return ``(arrays, meta)`` as passed to ``save_checkpoint``."""
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        arrays = {name: data[name] for name in data.files if name != "meta"}
+    return arrays, meta
@@ -0,0 +1,81 @@
+"""Learning-rate schedules, early stopping and validation cadence for
+02_train_model.py.
+
+Epochs are 1-based throughout, as in 02_val_metrics.tsv. With the
+defaults (constant schedule, validation every epoch on the full set, no
+patience) training is exactly what it was without these options.
+"""
+import math
+
+import numpy as np
+
+SCHEDULES = ("constant", "step", "cosine")
+
+
+def scheduled_lr(
+    base_lr: float,
+    epoch: int,
+    epochs: int,
+    schedule: str = "constant",
+    step_size: int = 1,
+    gamma: float = 0.5,
+    min_lr: float = 0.0,
+) -> float:
+    """Learning rate for ``epoch``.
+
+    step: ``base_lr * gamma ** ((epoch - 1) // step_size)``.
+    cosine: anneals from ``base_lr`` at epoch 1 towards ``min_lr`` after
+    the last epoch.
+    """
+    if schedule == "constant":
+        return base_lr
+    if schedule == "step":
+        return base_lr * gamma ** ((epoch - 1) // step_size)
+    if schedule == "cosine":
+        progress = (epoch - 1) / epochs
+        return min_lr + 0.5 * (base_lr - min_lr) * (1.0 + math.cos(math.pi * progress))
+    raise ValueError(f"unknown lr schedule {schedule!r}; expected one of {SCHEDULES}")
+
+
+def is_validation_epoch(epoch: int, epochs: int, every: int) -> bool:
+    # The last epoch is always validated so the run ends on a measured model.
+    return epoch % every == 0 or epoch == epochs
+
+
+def validation_subset(
+    X_val: np.ndarray, y_val: np.ndarray, size: int, seed: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """A fixed random ``size``-row subset (all rows if ``size`` is 0 or too big).
+
+    Drawn from its own generator, so the training batch order is the same
+    with or without a subset.
+    """
+    if size <= 0 or size >= len(y_val):
+        return X_val, y_val
+    idx = np.sort(np.random.default_rng(seed).choice(len(y_val), size=size, replace=False))
+    return X_val[idx], y_val[idx]
+
+
+class EarlyStopping:
+    """Stop once the val loss has not improved for ``patience`` epochs.
+
+    An improvement is a val loss below the best so far by more than
+    ``min_delta``; a NaN loss never improves. Call ``update`` after each
+    validation; it returns True when that epoch is the new best.
+    """
+
+    def __init__(self, patience: int, min_delta: float = 0.0) -> None:
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best_loss = math.inf
+        self.best_epoch = 0
+
+    def update(self, epoch: int, val_loss: float) -> bool:
+        if val_loss < self.best_loss - self.min_delta:
+            self.best_loss = val_loss
+            self.best_epoch = epoch
+            return True
+        return False
+
+    def should_stop(self, epoch: int) -> bool:
+        return epoch - self.best_epoch >= self.patience
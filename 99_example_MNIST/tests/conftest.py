@@ -0,0 +1,16 @@
+import importlib.util
+import os
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+# The scripts import their sibling modules directly, as when run as
+# ``python scripts/<name>.py``.
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+def load_script(name: str):
+    """Import a numbered script such as ``01_download.py`` as a module."""
+    spec = importlib.util.spec_from_file_location(name.replace(".py", ""), os.path.join(SCRIPTS_DIR, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
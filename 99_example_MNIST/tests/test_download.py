@@ -0,0 +1,89 @@
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+
+import pytest
+
+from conftest import load_script
+
+download = load_script("01_download.py")
+
+PAYLOAD = os.urandom(300_000)
+TRUNCATE_AT = 100_000
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD; the ``/bad/`` mirror drops the connection part-way."""
+
+    ranges: list = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        type(self).ranges.append((self.path, header))
+        if self.path.startswith("/bad/"):
+            # Promise the whole file, send a third of it, hang up.
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(PAYLOAD)))
+            self.end_headers()
+            self.wfile.write(PAYLOAD[:TRUNCATE_AT])
+            self.close_connection = True
+            return
+        start = int(header[len("bytes="):].rstrip("-")) if header else 0
+        body = PAYLOAD[start:]
+        self.send_response(206 if header else 200)
+        if header:
+            self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def mirror():
+    MirrorHandler.ranges = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MirrorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_truncated_mirror_fails_over_and_resumes(mirror, tmp_path):
+    dest = str(tmp_path / "data.gz")
+    sha256 = hashlib.sha256(PAYLOAD).hexdigest()
+    urls = [f"{mirror}/bad/data.gz", f"{mirror}/good/data.gz"]
+
+    download._download(urls, dest, sha256, timeout=10.0)
+
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(dest + ".tmp")
+    # The good mirror only sent what the bad one had not.
+    assert MirrorHandler.ranges == [
+        ("/bad/data.gz", None),
+        ("/good/data.gz", f"bytes={TRUNCATE_AT}-"),
+    ]
+
+
+def test_checksum_mismatch_discards_partial(mirror, tmp_path):
+    dest = str(tmp_path / "data.gz")
+    with pytest.raises(RuntimeError):
+        download._download([f"{mirror}/good/data.gz"], dest, "0" * 64, timeout=10.0)
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".tmp")
+
+
+def test_rank_mirrors_puts_dead_mirror_last(mirror):
+    dead = "http://127.0.0.1:9/"
+    ranked = download._rank_mirrors([dead, f"{mirror}/good/"], "data.gz", timeout=2.0)
+    assert ranked == [f"{mirror}/good/", dead]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from mnist_data import ShardedDataset, write_shards
+
+N_ROWS = 1000
+SHARD_SIZE = 100
+
+
+@pytest.fixture
+def shard_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 256, size=(N_ROWS, 16), dtype=np.uint8)
+    y = rng.integers(0, 10, size=N_ROWS, dtype=np.uint8)
+    write_shards(str(tmp_path), X, y, shard_size=SHARD_SIZE)
+    return str(tmp_path), X, y
+
+
+def _count_loads(dataset, monkeypatch):
+    loads = []
+    load = dataset._load
+
+    def counting_load(i):
+        loads.append(i)
+        return load(i)
+
+    monkeypatch.setattr(dataset, "_load", counting_load)
+    return loads
+
+
+def test_iter_batches_reuses_the_shard_cache(shard_dir, monkeypatch):
+    path, X, y = shard_dir
+    dataset = ShardedDataset(path, cache_shards=N_ROWS // SHARD_SIZE)
+    loads = _count_loads(dataset, monkeypatch)
+    rng = np.random.default_rng(1)
+    for _ in range(3):
+        batches = list(dataset.iter_batches(64, rng))
+        X_epoch = np.concatenate([X_batch for X_batch, _ in batches])
+        y_epoch = np.concatenate([y_batch for _, y_batch in batches])
+        order = np.lexsort((y_epoch, *X_epoch.T[::-1]))
+        expected = np.lexsort((y, *X.T[::-1]))
+        assert np.array_equal(X_epoch[order], X[expected])
+        assert np.array_equal(y_epoch[order], y[expected])
+    # Every shard was read once, on the first epoch.
+    assert sorted(loads) == list(range(N_ROWS // SHARD_SIZE))
+
+
+def test_iter_batches_keeps_the_cache_bounded(shard_dir, monkeypatch):
+    path, _, _ = shard_dir
+    dataset = ShardedDataset(path, cache_shards=3)
+    loads = _count_loads(dataset, monkeypatch)
+    for _ in dataset.iter_batches(64, np.random.default_rng(1)):
+        assert len(dataset._cache) <= 3
+    assert len(loads) == N_ROWS // SHARD_SIZE
+    # The last window is still cached, so take() on it does not read again.
+    cached = next(iter(dataset._cache))
+    dataset.take([dataset.offsets[cached]])
+    assert len(loads) == N_ROWS // SHARD_SIZE
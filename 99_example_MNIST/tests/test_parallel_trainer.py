@@ -0,0 +1,45 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from parallel_trainer import DataParallelSGD
+from softmax_trainer import SoftmaxSGD
+
+# Worker slices are summed in another order than a single batch, so the
+# weights agree to float32 rounding (about 1e-7 here), not bit for bit.
+ATOL = 1e-6
+
+
+def test_two_workers_match_single_process(tmp_path):
+    rng = np.random.default_rng(0)
+    n, n_features, batch_size = 600, 32, 64
+    X = rng.integers(0, 256, size=(n, n_features), dtype=np.uint8)
+    y = rng.integers(0, 10, size=n).astype(np.int64)
+    np.save(tmp_path / "X.npy", X)
+    np.save(tmp_path / "y.npy", y)
+    W0 = rng.normal(scale=0.01, size=(n_features, 10)).astype(np.float32)
+    b0 = np.zeros(10, dtype=np.float32)
+    X_float = X.astype(np.float32) / np.float32(255)
+    batches = [rng.permutation(n)[start : start + batch_size] for start in range(0, n, batch_size)]
+
+    single = SoftmaxSGD(W0.copy(), b0.copy(), batch_size)
+    for rows in batches:
+        single.step(X_float[rows], y[rows], 0.5)
+
+    parallel = DataParallelSGD(
+        str(tmp_path / "X.npy"), str(tmp_path / "y.npy"), W0, b0, batch_size, workers=2
+    )
+    names = [shm.name for shm in parallel._blocks]
+    with parallel:
+        for rows in batches:
+            parallel.step(rows, 0.5)
+
+    np.testing.assert_allclose(parallel.W, single.W, rtol=0, atol=ATOL)
+    np.testing.assert_allclose(parallel.b, single.b, rtol=0, atol=ATOL)
+    assert not np.array_equal(parallel.W, W0)
+    # close() unlinked every shared-memory segment.
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from softmax_trainer import COLUMN_MAX_MIN_BATCH, SoftmaxSGD
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def reference_step(X_batch, y_batch, W, b, lr) -> None:
+    # The loop body 02_train_model.py used before SoftmaxSGD.
+    logits = X_batch @ W + b
+    probs = softmax(logits)
+    loss_grad = probs
+    loss_grad[np.arange(len(y_batch)), y_batch] -= 1
+    loss_grad /= len(y_batch)
+
+    grad_W = X_batch.T @ loss_grad
+    grad_b = loss_grad.sum(axis=0)
+
+    W -= lr * grad_W
+    b -= lr * grad_b
+
+
+# Both sides of COLUMN_MAX_MIN_BATCH, and a last batch shorter than the rest.
+@pytest.mark.parametrize("batch_size", [32, COLUMN_MAX_MIN_BATCH, 1024])
+def test_step_is_bit_identical_to_reference(batch_size):
+    rng = np.random.default_rng(0)
+    n = 3 * batch_size + batch_size // 3
+    X = rng.integers(0, 256, size=(n, 64)).astype(np.float32) / np.float32(255)
+    y = rng.integers(0, 10, size=n)
+    W_ref = rng.normal(scale=0.01, size=(64, 10)).astype(np.float32)
+    b_ref = np.zeros(10, dtype=np.float32)
+    trainer = SoftmaxSGD(W_ref.copy(), b_ref.copy(), batch_size)
+
+    for epoch in range(2):
+        for start in range(0, n, batch_size):
+            X_batch, y_batch = X[start : start + batch_size], y[start : start + batch_size]
+            reference_step(X_batch, y_batch, W_ref, b_ref, 0.1)
+            trainer.step(X_batch, y_batch, 0.1)
+
+    assert np.array_equal(trainer.W, W_ref)
+    assert np.array_equal(trainer.b, b_ref)
@@ -0,0 +1,228 @@
+"""asyncio serving engine for html_server.py (``--engine asyncio``).
+
+ThreadingHTTPServer dedicates an OS thread to every open connection, so idle
+keep-alive sockets and long-lived /__events streams each pin a thread. Here
+one event loop owns every socket. Only the request handling itself (path
+checks, stat/open, building compressed sidecars, rendering listings and the
+viewer page) runs on a small bounded thread pool, and file bodies are
+streamed from the loop with ``loop.sendfile``.
+
+Requests are still answered by FilteredHTTPRequestHandler's own code, run
+against an in-memory request/response pair, so routing and the allow-list
+(``_is_allowed_parts``, ``ANALYSIS_DIR_RE``) behave exactly as with the
+threading engine.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import traceback
+
+from file_watcher import (
+    EVENTS_KEEPALIVE,
+    EVENTS_KEEPALIVE_COMMENT,
+    EVENTS_PREAMBLE,
+    event_message,
+)
+from metrics import METRICS
+
+DEFAULT_WORKERS = 8
+# Idle keep-alive connections are closed after this many seconds.
+KEEPALIVE_TIMEOUT = 30.0
+MAX_HEAD_SIZE = 64 * 1024
+
+
+def _bridge_class(handler_cls):
+    class AsyncBridgeHandler(handler_cls):
+        """Run one request through ``handler_cls`` without touching a socket.
+
+        Headers and small in-memory bodies land in ``wfile``. File bodies
+        and event streams are only recorded, for the event loop to send.
+        """
+
+        protocol_version = "HTTP/1.1"
+        # Latency and bytes are recorded once the loop has sent the body.
+        _defer_metrics = True
+
+        def __init__(self, head: bytes, client_address) -> None:
+            # BaseRequestHandler.__init__ would start reading from a socket.
+            self.client_address = client_address
+            self.server = None
+            self.rfile = io.BytesIO(head)
+            self.wfile = io.BytesIO()
+            self.close_connection = True
+            self.file_body = None
+            self.events_target = None
+
+        def copyfile(self, source, outputfile):
+            if self._body_plan is None:
+                return super().copyfile(source, outputfile)
+            # do_GET closes ``source`` as soon as we return; keep a private
+            # descriptor for the loop to stream from.
+            self.file_body = (open(os.dup(source.fileno()), "rb"), self._body_plan)
+
+        def _serve_events(self):
+            target = self._events_target()
+            if target is not None and self.command != "HEAD":
+                self.close_connection = True
+                self.events_target = target
+            return None
+
+    return AsyncBridgeHandler
+
+
+class _LoopQueue:
+    """Thread-safe ``put`` that forwards into an asyncio.Queue."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, item) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+
+def _content_length(head: bytes) -> int:
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            try:
+                return max(0, int(value.strip()))
+            except ValueError:
+                return 0
+    return 0
+
+
+class AsyncHTTPServer:
+    def __init__(self, handler_cls, workers: int = DEFAULT_WORKERS) -> None:
+        self.handler_cls = handler_cls
+        self.bridge_cls = _bridge_class(handler_cls)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="html-server"
+        )
+
+    async def serve_forever(self, host: str, port: int) -> None:
+        loop = asyncio.get_running_loop()
+        # loop.sendfile's non-zero-copy fallback reads files on the default
+        # executor; keep that on the same bounded pool.
+        loop.set_default_executor(self.executor)
+        server = await asyncio.start_server(
+            self._handle_connection, host, port, limit=MAX_HEAD_SIZE
+        )
+        async with server:
+            await server.serve_forever()
+
+    def _run_handler(self, head: bytes, peer):
+        handler = self.bridge_cls(head, peer)
+        try:
+            handler.handle_one_request()
+        except Exception:
+            # Always hand the handler back, so the loop still records its
+            # metrics (and the in-flight gauge goes down).
+            handler.log_error("Exception handling %r", getattr(handler, "requestline", ""))
+            traceback.print_exc()
+            if handler.file_body is not None:
+                handler.file_body[0].close()
+            handler.file_body = handler.events_target = None
+            handler.close_connection = True
+            if not handler.wfile.getvalue():
+                # Nothing sent yet: answer 500 instead of dropping the socket.
+                handler._headers_buffer = []
+                try:
+                    handler.send_error(500, "Internal server error")
+                except Exception:
+                    handler.wfile = io.BytesIO()
+        return handler
+
+    async def _handle_connection(self, reader, writer) -> None:
+        loop = asyncio.get_running_loop()
+        peer = writer.get_extra_info("peername") or ("", 0)
+        METRICS.connection_opened()
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT
+                    )
+                    length = _content_length(head)
+                    if length:
+                        await reader.readexactly(length)
+                except (
+                    asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError,
+                    asyncio.TimeoutError,
+                    ConnectionError,
+                ):
+                    return
+                handler = await loop.run_in_executor(
+                    self.executor, self._run_handler, head, peer
+                )
+                try:
+                    writer.write(handler.wfile.getvalue())
+                    if handler.file_body is not None:
+                        await self._send_file_body(writer, *handler.file_body)
+                    if handler.events_target is not None:
+                        await self._stream_events(writer, handler)
+                        return
+                    await writer.drain()
+                except ConnectionError:
+                    return
+                except Exception:
+                    # Headers are already out; all that is left is to hang up.
+                    handler.log_error("Exception sending %r", getattr(handler, "requestline", ""))
+                    traceback.print_exc()
+                    return
+                finally:
+                    handler._record_metrics()
+                if handler.close_connection:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            METRICS.connection_closed()
+            writer.close()
+
+    async def _send_file_body(self, writer, source, plan) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            for part in plan:
+                if isinstance(part, bytes):
+                    writer.write(part)
+                    continue
+                offset, count = part
+                if count == 0:
+                    continue
+                await writer.drain()
+                await loop.sendfile(writer.transport, source, offset, count)
+        finally:
+            source.close()
+
+    async def _stream_events(self, writer, handler) -> None:
+        target = handler.events_target
+        events = _LoopQueue(asyncio.get_running_loop())
+        watcher = self.handler_cls.watcher
+        watcher.subscribe(target, events)
+        try:
+            writer.write(EVENTS_PREAMBLE)
+            while True:
+                await writer.drain()
+                try:
+                    version = await asyncio.wait_for(
+                        events.queue.get(), EVENTS_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    message = EVENTS_KEEPALIVE_COMMENT
+                else:
+                    message = event_message(version)
+                writer.write(message)
+                handler._stream_bytes += len(message)
+        except ConnectionError:
+            pass
+        finally:
+            watcher.unsubscribe(target, events)
+
+
+def serve(handler_cls, host: str, port: int, workers: int = DEFAULT_WORKERS) -> None:
+    asyncio.run(AsyncHTTPServer(handler_cls, workers).serve_forever(host, port))
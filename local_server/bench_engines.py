@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Load benchmark comparing html_server.py's threading and asyncio engines.
+
+Usage:
+  python local_server/bench_engines.py --clients 128 --requests 20
+
+For each engine this starts html_server.py on a scratch directory, opens
+``--event-streams`` long-lived /__events connections (like open PDF viewer
+tabs), then has ``--clients`` concurrent keep-alive clients fetch a mix of
+a small HTML page and a larger binary file. It reports request latency
+percentiles and the server's peak thread count and RSS (read from /proc,
+so those two columns are Linux-only).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SERVER = Path(__file__).with_name("html_server.py")
+PATHS = ["/01_bench/output/report.html", "/01_bench/output/data.bin"]
+
+
+def _make_root(root: Path, file_size: int) -> None:
+    out = root / "01_bench" / "output"
+    out.mkdir(parents=True)
+    (out / "report.html").write_text(
+        "<html><body>" + "<p>row</p>" * 200 + "</body></html>", encoding="utf-8"
+    )
+    (out / "data.bin").write_bytes(os.urandom(file_size))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit(f"server did not start on port {port}")
+
+
+class _ProcSampler(threading.Thread):
+    """Track peak thread count and RSS of a process from /proc."""
+
+    def __init__(self, pid: int) -> None:
+        super().__init__(daemon=True)
+        self.status = Path(f"/proc/{pid}/status")
+        self.peak_threads = 0
+        self.peak_rss_kb = 0
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                text = self.status.read_text()
+            except OSError:
+                return
+            for line in text.splitlines():
+                key, _, value = line.partition(":")
+                if key == "Threads":
+                    self.peak_threads = max(self.peak_threads, int(value))
+                elif key == "VmRSS":
+                    self.peak_rss_kb = max(self.peak_rss_kb, int(value.split()[0]))
+            self.stopped.wait(0.02)
+
+
+async def _read_response(reader) -> bool:
+    """Read one response; return True if the server keeps the connection."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    keep_alive = lines[0].startswith("HTTP/1.1")
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection" and value.strip().lower() == "close":
+            keep_alive = False
+    if length:
+        await reader.readexactly(length)
+    return keep_alive
+
+
+async def _client(port: int, n_requests: int, offset: int, latencies: list, errors: list):
+    reader = writer = None
+    for i in range(n_requests):
+        path = PATHS[(offset + i) % len(PATHS)]
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", port, limit=1 << 20
+                )
+            writer.write(
+                f"GET {path} HTTP/1.1\r\nHost: bench\r\n"
+                "Connection: keep-alive\r\n\r\n".encode("ascii")
+            )
+            await writer.drain()
+            keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            errors.append(exc)
+            keep_alive = False
+        else:
+            latencies.append(time.perf_counter() - start)
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _event_stream(port: int, stop: asyncio.Event) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET /__events?path={PATHS[0]} HTTP/1.1\r\nHost: bench\r\n\r\n".encode("ascii")
+    )
+    await writer.drain()
+    await stop.wait()
+    writer.close()
+
+
+async def _run_load(port: int, clients: int, n_requests: int, streams: int):
+    latencies: list[float] = []
+    errors: list[BaseException] = []
+    stop = asyncio.Event()
+    stream_tasks = [asyncio.create_task(_event_stream(port, stop)) for _ in range(streams)]
+    await asyncio.sleep(0.2)
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(_client(port, n_requests, c, latencies, errors) for c in range(clients))
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*stream_tasks, return_exceptions=True)
+    return latencies, errors, elapsed
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def bench_engine(engine: str, root: Path, args: argparse.Namespace) -> dict:
+    port = _free_port()
+    cmd = [
+        sys.executable,
+        str(SERVER),
+        "--port",
+        str(port),
+        "--engine",
+        engine,
+        "--cache-dir",
+        str(root / ".cache"),
+    ]
+    proc = subprocess.Popen(
+        cmd, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_for_port(port)
+        sampler = _ProcSampler(proc.pid)
+        sampler.start()
+        latencies, errors, elapsed = asyncio.run(
+            _run_load(port, args.clients, args.requests, args.event_streams)
+        )
+        sampler.stopped.set()
+        sampler.join()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    latencies.sort()
+    return {
+        "engine": engine,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed if elapsed else float("nan"),
+        "p50": _percentile(latencies, 0.50) * 1000,
+        "p95": _percentile(latencies, 0.95) * 1000,
+        "p99": _percentile(latencies, 0.99) * 1000,
+        "threads": sampler.peak_threads or "n/a",
+        "rss_mb": round(sampler.peak_rss_kb / 1024, 1) if sampler.peak_rss_kb else "n/a",
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark html_server.py engines")
+    parser.add_argument("--clients", type=int, default=128)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--event-streams", type=int, default=20)
+    parser.add_argument("--file-size", type=int, default=256 * 1024)
+    parser.add_argument(
+        "--engines", nargs="+", default=["threading", "asyncio"]
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _make_root(root, args.file_size)
+        for engine in args.engines:
+            rows.append(bench_engine(engine, root, args))
+
+    print(
+        f"{args.clients} clients x {args.requests} requests, "
+        f"{args.event_streams} open event streams"
+    )
+    header = ["engine", "requests", "errors", "rps", "p50", "p95", "p99", "threads", "rss_mb"]
+    print("\t".join(header))
+    for row in rows:
+        cells = []
+        for key in header:
+            value = row[key]
+            cells.append(f"{value:.1f}" if isinstance(value, float) else str(value))
+        print("\t".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Vendor the browser assets html_server.py serves under /__static/.
+
+Usage:
+  python local_server/fetch_static.py
+
+Run this once on a machine with internet access and commit the result; the
+PDF viewer then works on air-gapped cluster nodes. Each asset is written to
+local_server/static/<name> together with .gz (and .br, if the brotli module
+is installed) precompressed copies that the server sends as-is.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+from pathlib import Path
+import urllib.request
+
+from html_server import PDFJS_CDN, PDFJS_VERSION, STATIC_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSETS = {
+    f"pdfjs/{PDFJS_VERSION}/pdf.min.js": PDFJS_CDN + "pdf.min.js",
+    f"pdfjs/{PDFJS_VERSION}/pdf.worker.min.js": PDFJS_CDN + "pdf.worker.min.js",
+}
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download vendored static assets")
+    parser.add_argument("--out-dir", type=Path, default=STATIC_DIR)
+    parser.add_argument("--force", action="store_true", help="Re-download existing files")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    for rel, url in ASSETS.items():
+        dest = args.out_dir / rel
+        if dest.exists() and not args.force:
+            print(f"exists: {dest}")
+            continue
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with urllib.request.urlopen(url) as resp:
+            data = resp.read()
+        _write_atomic(dest, data)
+        # Written after the source so their mtime is never older than it.
+        _write_atomic(dest.with_name(dest.name + ".gz"), gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            _write_atomic(dest.with_name(dest.name + ".br"), brotli.compress(data, quality=11))
+        print(f"fetched: {url} -> {dest} ({len(data)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
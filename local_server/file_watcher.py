@@ -0,0 +1,193 @@
+"""Shared file-change watcher used by html_server.py's /__events endpoint.
+
+One background thread serves every subscriber. On Linux it sleeps on an
+inotify descriptor watching the parent directories of subscribed files and
+wakes as soon as one of them is written, renamed into place or removed.
+Elsewhere (or if inotify is unavailable) it falls back to an mtime scan.
+Even with inotify, a slower scan keeps running because inotify does not see
+writes made by other hosts on network filesystems (NFS/GPFS), which is how
+cluster jobs usually update outputs.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import sys
+import threading
+import time
+from typing import Callable
+
+POLL_INTERVAL = 1.0
+INOTIFY_RESCAN_INTERVAL = 5.0
+# Comment lines sent on idle event streams so proxies and the SSH tunnel
+# do not drop them, and so dead clients are noticed.
+EVENTS_KEEPALIVE = 15.0
+EVENTS_KEEPALIVE_COMMENT = b": keepalive\n\n"
+EVENTS_PREAMBLE = b"retry: 2000\n\n"
+# Writers often touch a file several times in a row; wait this long after
+# the first inotify event so one regeneration produces one notification.
+DEBOUNCE = 0.1
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_WATCH_MASK = (
+    _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+)
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+
+class _Inotify:
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._libc = libc
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.fd = fd
+        self._wds: dict[str, int] = {}
+
+    def add_dir(self, path: str) -> None:
+        if path in self._wds:
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _IN_WATCH_MASK)
+        if wd >= 0:
+            self._wds[path] = wd
+
+    def remove_dir(self, path: str) -> None:
+        wd = self._wds.pop(path, None)
+        if wd is not None:
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def drain(self) -> bool:
+        """Discard pending events; return True if there were any."""
+        seen = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return seen
+            if not data:
+                return seen
+            seen = True
+
+
+def event_message(version: str) -> bytes:
+    """Frame a version as a Server-Sent Events ``change`` event."""
+    return f"event: change\ndata: {version}\n\n".encode("utf-8")
+
+
+def _file_version(path: str, version_of: Callable[[str, os.stat_result], str]) -> str:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    return version_of(path, st)
+
+
+class FileWatcher:
+    """Fan out change notifications for individual files to subscribers.
+
+    ``subscribe`` returns a queue that immediately receives the file's
+    current version and then every new version. A version is whatever
+    ``version_of`` returns for the file's stat result ("" if missing).
+    Callers that are not threads (e.g. an asyncio loop) can pass their own
+    object with a thread-safe ``put`` method instead.
+    """
+
+    def __init__(self, version_of: Callable[[str, os.stat_result], str]) -> None:
+        self._version_of = version_of
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set] = {}
+        self._versions: dict[str, str] = {}
+        self._dir_refs: dict[str, int] = {}
+        self._inotify: _Inotify | None = None
+        self._thread: threading.Thread | None = None
+
+    def subscribe(self, path: str, q=None):
+        if q is None:
+            q = queue.Queue()
+        version = _file_version(path, self._version_of)
+        with self._lock:
+            self._ensure_started()
+            subs = self._subscribers.setdefault(path, set())
+            if not subs:
+                self._versions[path] = version
+                self._watch_dir(os.path.dirname(path))
+            subs.add(q)
+        q.put(version)
+        return q
+
+    def unsubscribe(self, path: str, q) -> None:
+        with self._lock:
+            subs = self._subscribers.get(path)
+            if subs is None:
+                return
+            subs.discard(q)
+            if not subs:
+                del self._subscribers[path]
+                self._versions.pop(path, None)
+                self._unwatch_dir(os.path.dirname(path))
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                self._inotify = None
+        self._thread = threading.Thread(
+            target=self._run, name="file-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def _watch_dir(self, directory: str) -> None:
+        count = self._dir_refs.get(directory, 0)
+        self._dir_refs[directory] = count + 1
+        if count == 0 and self._inotify is not None:
+            self._inotify.add_dir(directory)
+
+    def _unwatch_dir(self, directory: str) -> None:
+        count = self._dir_refs.get(directory, 0) - 1
+        if count > 0:
+            self._dir_refs[directory] = count
+            return
+        self._dir_refs.pop(directory, None)
+        if self._inotify is not None:
+            self._inotify.remove_dir(directory)
+
+    def _run(self) -> None:
+        if self._inotify is None:
+            while True:
+                time.sleep(POLL_INTERVAL)
+                self._rescan()
+        fd = self._inotify.fd
+        while True:
+            readable, _, _ = select.select([fd], [], [], INOTIFY_RESCAN_INTERVAL)
+            if readable:
+                time.sleep(DEBOUNCE)
+                self._inotify.drain()
+            self._rescan()
+
+    def _rescan(self) -> None:
+        with self._lock:
+            paths = list(self._subscribers)
+        for path in paths:
+            version = _file_version(path, self._version_of)
+            with self._lock:
+                if path not in self._subscribers:
+                    continue
+                if self._versions.get(path) == version:
+                    continue
+                self._versions[path] = version
+                for q in self._subscribers[path]:
+                    q.put(version)
+
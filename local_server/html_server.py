@@ -3,6 +3,7 @@
 
 Usage:
   python local_server/html_server.py --port 8000
+  python local_server/html_server.py --port 8000 --engine asyncio
 
 By default, this server only exposes:
   - project_journal/
@@ -12,24 +13,521 @@ By default, this server only exposes:
 from __future__ import annotations
 
 import argparse
+import datetime
+import email.utils
 import getpass
+import gzip
+import hashlib
 import html
 import json
 from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 import io
 import os
 from pathlib import Path
+import queue
 import re
+import secrets
+import shutil
 import socket
-from urllib.parse import parse_qs, unquote, urlencode, urlparse
+import stat
+import tempfile
+import threading
+import time
+from typing import NamedTuple
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlparse
+
+from file_watcher import (
+    EVENTS_KEEPALIVE,
+    EVENTS_KEEPALIVE_COMMENT,
+    EVENTS_PREAMBLE,
+    FileWatcher,
+    event_message,
+)
+from metrics import METRICS, HitCounter
+
+try:
+    import brotli
+except ImportError:  # optional: gzip alone still covers every browser
+    brotli = None
 
 
 ALLOWED_ROOT_DIRS = {"project_journal", "figure_aggregator"}
 ANALYSIS_DIR_RE = re.compile(r"^\d{2,}_.+")
 PDF_VIEWER_PATH = "/__pdf_viewer"
+EVENTS_PATH = "/__events"
+STATS_PATH = "/__stats"
+STATIC_PREFIX = "/__static/"
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+DEFAULT_CACHE_CONTROL = "no-cache"
+# Static asset URLs embed a hash of the file, so a URL never changes meaning.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Pipeline outputs named <stem>-<12 hex digits>.min.js/.css embed a content
+# hash (e.g. plotly-<hash>.min.js from 03_plot_epoch_vs_accuracy.py
+# --plotlyjs shared), so they get the same immutable caching.
+HASHED_ASSET_RE = re.compile(r"^[\w.]+-[0-9a-f]{12}\.min\.(js|css)$")
+PDFJS_VERSION = "3.11.174"
+PDFJS_CDN = f"https://cdnjs.cloudflare.com/ajax/libs/pdf.js/{PDFJS_VERSION}/"
+DEFAULT_COMPRESS_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "html_server"
+)
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+}
+# Preference order when the client accepts several encodings equally.
+SIDECAR_SUFFIXES = {"br": "br", "gzip": "gz"}
+# Requests asking for more ranges than this get the whole file instead.
+MAX_RANGES = 32
+# Directory listings: names are revalidated against the directory's mtime on
+# every request, per-entry size/mtime are re-stat'ed at most this often.
+LISTING_STAT_TTL = 10.0
+LISTING_CACHE_DIRS = 256
+LISTING_PAGE_SIZE = 500
+LISTING_MAX_PAGE_SIZE = 5000
+LISTING_SORT_KEYS = ("name", "size", "mtime")
+# Appended to served HTML pages with --live-reload: reload the page when
+# /__events reports a version different from the one seen on first connect.
+# Off by default because every open page holds its own stream, and browsers
+# allow only 6 HTTP/1.x connections per host.
+LIVE_RELOAD_SNIPPET = b"""
+<script>
+(function () {
+  if (!window.EventSource) return;
+  var first = null;
+  var source = new EventSource(
+    "/__events?path=" + encodeURIComponent(location.pathname)
+  );
+  source.addEventListener("change", function (event) {
+    if (first === null) {
+      first = event.data;
+    } else if (event.data !== first) {
+      source.close();
+      location.reload();
+    }
+  });
+})();
+</script>
+"""
+
+
+def _stat_version(path: str, st: os.stat_result) -> str:
+    """Uncached ``"<ino>-<size>-<mtime_ns>"`` (hex), the same string as the ETag."""
+    return '"{:x}-{:x}-{:x}"'.format(st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class ValidatorCache:
+    """Per-path strong ETags derived from (inode, size, mtime_ns).
+
+    A regenerated file always changes at least one of the three fields, so
+    the ETag changes with it even when the rewrite lands within the same
+    second as the previous version (which Last-Modified alone cannot see).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[tuple[int, int, int], str]] = {}
+        self.stats = HitCounter()
+
+    def etag(self, path: str, st: os.stat_result) -> str:
+        key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == key:
+                self.stats.hit()
+                return cached[1]
+        self.stats.miss()
+        value = _stat_version(path, st)
+        with self._lock:
+            self._entries[path] = (key, value)
+        return value
+
+
+VALIDATORS = ValidatorCache()
+
+
+class CompressionCache:
+    """On-disk ``.gz``/``.br`` sidecars for compressible files.
+
+    Sidecars are named after a hash of the source's path plus the
+    (inode, size, mtime_ns) triple its ETag is built from, so a source
+    replaced by one with the same mtime (``rsync -a``, ``cp -p``) still
+    gets a new sidecar. Building one removes the previous versions for the
+    same path, which keeps at most one sidecar per source and encoding.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.stats = HitCounter()
+
+    def sidecar(
+        self, path: str, src, st: os.stat_result, encoding: str, trailer: bytes = b""
+    ) -> str | None:
+        """Return a sidecar holding the compressed ``src`` + ``trailer``."""
+        key = path.encode("utf-8", "surrogateescape") + b"\0" + trailer
+        digest = hashlib.sha1(key).hexdigest()
+        suffix = SIDECAR_SUFFIXES[encoding]
+        version = "{:x}-{:x}-{:x}".format(st.st_ino, st.st_size, st.st_mtime_ns)
+        target = self.root / f"{digest}-{version}.{suffix}"
+        if target.exists():
+            self.stats.hit()
+            return str(target)
+        self.stats.miss()
+        try:
+            self._build(target, src, encoding, trailer)
+        except OSError:
+            return None
+        for stale in self.root.glob(f"{digest}-*.{suffix}"):
+            if stale != target:
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+        return str(target)
+
+    def _build(self, target: Path, src, encoding: str, trailer: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                src.seek(0)
+                if encoding == "br":
+                    out.write(brotli.compress(src.read() + trailer, quality=9))
+                else:
+                    with gzip.GzipFile(
+                        fileobj=out, mode="wb", compresslevel=6, mtime=0
+                    ) as gz:
+                        shutil.copyfileobj(src, gz)
+                        gz.write(trailer)
+            src.seek(0)
+            os.replace(tmp, target)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+
+class DirEntry(NamedTuple):
+    name: str
+    is_dir: bool
+    size: int
+    mtime: float
+
+
+class ListingCache:
+    """In-process directory listings for slow (NFS/GPFS) filesystems.
+
+    A directory is only re-read when its (inode, mtime_ns) changes, and then
+    only new names are stat'ed; names that disappeared are dropped. Because
+    rewriting a file in place does not touch its directory's mtime, each
+    entry's own stat result is refreshed once it is older than ``stat_ttl``.
+    """
+
+    def __init__(self, stat_ttl: float = LISTING_STAT_TTL) -> None:
+        self.stat_ttl = stat_ttl
+        self._lock = threading.Lock()
+        self._dirs: dict[str, tuple[tuple[int, int], dict[str, tuple[DirEntry, float]]]] = {}
+        self.stats = HitCounter()
+
+    def entries(self, path: str) -> list[DirEntry]:
+        st = os.stat(path)
+        key = (st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            cached = self._dirs.get(path)
+        known = cached[1] if cached is not None else {}
+        if cached is not None and cached[0] == key:
+            self.stats.hit()
+            names = list(known)
+        else:
+            self.stats.miss()
+            names = os.listdir(path)
+        now = time.monotonic()
+        fresh: dict[str, tuple[DirEntry, float]] = {}
+        for name in names:
+            prev = known.get(name)
+            if prev is not None and now - prev[1] < self.stat_ttl:
+                fresh[name] = prev
+                continue
+            try:
+                est = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            entry = DirEntry(name, stat.S_ISDIR(est.st_mode), est.st_size, est.st_mtime)
+            fresh[name] = (entry, now)
+        with self._lock:
+            self._dirs.pop(path, None)
+            self._dirs[path] = (key, fresh)
+            while len(self._dirs) > LISTING_CACHE_DIRS:
+                del self._dirs[next(iter(self._dirs))]
+        return [entry for entry, _ in fresh.values()]
+
+
+LISTINGS = ListingCache()
+# 304s versus full bodies, over requests that carried a validator.
+REVALIDATIONS = HitCounter()
+
+
+class StaticAssets:
+    """Content-hashed URLs for files vendored under ``local_server/static/``.
+
+    ``pdfjs/3.11.174/pdf.min.js`` is published as
+    ``/__static/pdfjs/3.11.174/pdf.min.<hash>.js``, where ``<hash>`` is the
+    start of the file's SHA-256, so responses can be cached forever.
+    """
+
+    HASHED_NAME_RE = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{12})(?P<ext>\.[^./]+)$")
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._digests: dict[str, tuple[tuple[int, int], str]] = {}
+
+    def _path(self, rel: str) -> Path | None:
+        """``root / rel`` if it stays inside ``root`` (absolute and ``..`` paths do not)."""
+        if Path(rel).is_absolute() or ".." in Path(rel).parts:
+            return None
+        path = self.root / rel
+        try:
+            if not path.resolve().is_relative_to(self.root.resolve()):
+                return None
+        except OSError:
+            return None
+        return path
+
+    def url(self, rel: str) -> str | None:
+        """Return the hashed URL for ``rel``, or None if it is not vendored."""
+        path = self._path(rel)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        key = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(rel)
+        if cached is not None and cached[0] == key:
+            digest = cached[1]
+        else:
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+            digest = sha.hexdigest()[:12]
+            with self._lock:
+                self._digests[rel] = (key, digest)
+        stem, ext = os.path.splitext(rel)
+        return f"{STATIC_PREFIX}{stem}.{digest}{ext}"
+
+    def resolve(self, hashed_rel: str) -> str | None:
+        """Map a hashed URL path back to a file, if the hash is current."""
+        match = self.HASHED_NAME_RE.match(hashed_rel)
+        if match is None:
+            return None
+        rel = match["stem"] + match["ext"]
+        path = self._path(rel)
+        if path is None or self.url(rel) != STATIC_PREFIX + hashed_rel:
+            return None
+        return str(path)
+
+
+STATIC_ASSETS = StaticAssets(STATIC_DIR)
+
+
+def _precompressed_sibling(path: str, st: os.stat_result, encoding: str) -> str | None:
+    sibling = f"{path}.{SIDECAR_SUFFIXES[encoding]}"
+    try:
+        if os.stat(sibling).st_mtime_ns >= st.st_mtime_ns:
+            return sibling
+    except OSError:
+        pass
+    return None
+
+
+def _format_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{size} B"
+
+
+def _query_int(query: dict[str, list[str]], name: str, default: int) -> int:
+    try:
+        return int(query.get(name, [default])[0])
+    except ValueError:
+        return default
+
+
+def _is_compressible(ctype: str) -> bool:
+    ctype = ctype.split(";", 1)[0].strip().lower()
+    return ctype.startswith("text/") or ctype in COMPRESSIBLE_TYPES
+
+
+def _accepted_encodings(header_value: str) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for item in header_value.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def _parse_ranges(header_value: str, size: int) -> list[tuple[int, int]] | None:
+    """Parse a ``Range: bytes=...`` header into inclusive (start, end) pairs.
+
+    Returns None when the header is malformed or uses another unit (the
+    caller then ignores it and sends the full body), and an empty list when
+    it is well-formed but no range overlaps the file (416).
+    """
+    unit, _, spec = header_value.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    ranges: list[tuple[int, int]] = []
+    for item in spec.split(","):
+        first, sep, last = item.strip().partition("-")
+        first, last = first.strip(), last.strip()
+        if not sep or not (first or last):
+            return None
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                ranges.append((max(0, size - suffix), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else size - 1
+        except ValueError:
+            return None
+        if end < start and last:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+def _tagged_etag(etag: str, tag: str) -> str:
+    return f'{etag[:-1]}-{tag}"'
+
+
+def _etag_matches(header_value: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so a W/ prefix is ignored.
+    for candidate in header_value.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+# The watcher rescans on its own schedule; going through VALIDATORS would
+# count its polls as request cache hits/misses in /__stats.
+WATCHER = FileWatcher(_stat_version)
+
+METRICS.register_cache("etag", VALIDATORS.stats.counts)
+METRICS.register_cache("listing", LISTINGS.stats.counts)
+METRICS.register_cache("client_revalidation", REVALIDATIONS.counts)
 
 
 class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
+    compression: CompressionCache | None = None
+    live_reload = False
+    watcher = WATCHER
+    # Byte-level layout of the body returned by send_head: raw bytes are
+    # written as-is, (offset, length) spans are sent from the file with
+    # sendfile. None means "copy the whole returned object".
+    _body_plan: list[bytes | tuple[int, int]] | None = None
+    _cache_control = DEFAULT_CACHE_CONTROL
+    # Per-request bookkeeping for METRICS. The asyncio engine records a
+    # request itself once the body is on the wire (_defer_metrics).
+    _defer_metrics = False
+    _request_start: float | None = None
+    _route = "other"
+    _status = 0
+    _response_length = 0
+    _header_bytes = 0
+    _stream_bytes = 0
+
+    def setup(self):
+        super().setup()
+        METRICS.connection_opened()
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            METRICS.connection_closed()
+
+    def handle_one_request(self):
+        self._request_start = None
+        try:
+            super().handle_one_request()
+        finally:
+            if not self._defer_metrics:
+                self._record_metrics()
+
+    def parse_request(self):
+        self._request_start = time.perf_counter()
+        self._route = "other"
+        self._status = 0
+        self._response_length = 0
+        self._header_bytes = 0
+        self._stream_bytes = 0
+        METRICS.request_started()
+        return super().parse_request()
+
+    def send_response_only(self, code, message=None):
+        self._status = int(code)
+        super().send_response_only(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "content-length":
+            self._response_length = int(value)
+        super().send_header(keyword, value)
+
+    def flush_headers(self):
+        buffered = getattr(self, "_headers_buffer", ())
+        self._header_bytes += sum(len(chunk) for chunk in buffered)
+        super().flush_headers()
+
+    def _record_metrics(self) -> None:
+        if self._request_start is None:
+            return
+        body = 0
+        if self.command != "HEAD" and self._status not in (204, 304):
+            body = self._response_length
+        METRICS.request_finished(
+            self._route,
+            self._status,
+            self._header_bytes + body + self._stream_bytes,
+            time.perf_counter() - self._request_start,
+        )
+        self._request_start = None
+
     def _rel_parts(self) -> list[str] | None:
         url_path = urlparse(self.path).path
         return self._parts_from_url_path(url_path)
@@ -69,44 +567,335 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
         return False
 
     def send_head(self):
+        self._body_plan = None
+        self._cache_control = DEFAULT_CACHE_CONTROL
         parsed = urlparse(self.path)
         path = parsed.path
         query = parse_qs(parsed.query)
 
         if path == PDF_VIEWER_PATH:
+            self._route = "viewer"
             return self._serve_pdf_viewer()
 
+        if path == EVENTS_PATH:
+            self._route = "events"
+            return self._serve_events()
+
+        if path == STATS_PATH:
+            self._route = "stats"
+            return self._serve_stats(query)
+
+        if path.startswith(STATIC_PREFIX):
+            self._route = "static"
+            asset = STATIC_ASSETS.resolve(unquote(path[len(STATIC_PREFIX):]))
+            if asset is None:
+                self.send_error(404, "Not found")
+                return None
+            self._cache_control = IMMUTABLE_CACHE_CONTROL
+            return self._send_file(asset, precompressed=True)
+
         if path.lower().endswith(".pdf") and "raw" not in query:
             parts = self._parts_from_url_path(path)
             if parts is None or not self._is_allowed_parts(parts):
                 self.send_error(404, "Not found")
                 return None
             target = f"{PDF_VIEWER_PATH}?{urlencode({'file': path})}"
+            self._route = "redirect"
             self.send_response(302)
             self.send_header("Location", target)
+            self.send_header("Content-Length", "0")
             self.end_headers()
             return None
 
         if not self._is_allowed():
+            self._route = "denied"
             self.send_error(404, "Not found")
             return None
 
-        # Disable conditional revalidation so regenerated files are never
-        # incorrectly served from browser cache via 304 responses.
-        for header_name in ("If-Modified-Since", "If-None-Match"):
-            if header_name in self.headers:
-                del self.headers[header_name]
-        return super().send_head()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = self._directory_index(path)
+            if index is None:
+                self._route = "listing"
+                return super().send_head()
+            path = index
+        self._route = "file"
+        if HASHED_ASSET_RE.match(os.path.basename(path)):
+            self._cache_control = IMMUTABLE_CACHE_CONTROL
+        return self._send_file(path)
 
     def end_headers(self):
-        # Disable client/proxy caching for all content served by this helper.
-        self.send_header(
-            "Cache-Control", "no-store, no-cache, must-revalidate, max-age=0"
-        )
-        self.send_header("Pragma", "no-cache")
-        self.send_header("Expires", "0")
+        # By default browsers may keep a copy but must revalidate it on every
+        # use, so regenerated files show up immediately while unchanged ones
+        # cost a bodiless 304.
+        self.send_header("Cache-Control", self._cache_control)
         super().end_headers()
 
+    def _directory_index(self, path: str) -> str | None:
+        if not urlparse(self.path).path.endswith("/"):
+            return None
+        for name in ("index.html", "index.htm"):
+            index = os.path.join(path, name)
+            if os.path.isfile(index):
+                return index
+        return None
+
+    def _send_file(self, path: str, precompressed: bool = False):
+        """Send headers for a file and return it (None if no body follows).
+
+        With ``precompressed``, ``<path>.gz``/``<path>.br`` siblings are used
+        as encoded bodies when present, before falling back to the sidecar
+        cache.
+        """
+        if path.endswith("/"):
+            self.send_error(404, "File not found")
+            return None
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        try:
+            st = os.fstat(f.fileno())
+            ctype = self.guess_type(path)
+            trailer = b""
+            if self.live_reload and ctype.startswith("text/html"):
+                trailer = LIVE_RELOAD_SNIPPET
+            identity_etag = VALIDATORS.etag(path, st)
+            if trailer:
+                identity_etag = _tagged_etag(identity_etag, "lr")
+            etag = identity_etag
+            vary = _is_compressible(ctype) and (
+                self.compression is not None or precompressed
+            )
+            encoding = None
+            if vary and st.st_size >= COMPRESS_MIN_SIZE:
+                encoding = self._negotiate_encoding()
+            if encoding is not None:
+                etag = _tagged_etag(etag, SIDECAR_SUFFIXES[encoding])
+            not_modified = self._not_modified(etag, st.st_mtime)
+            if "If-None-Match" in self.headers or "If-Modified-Since" in self.headers:
+                if not_modified:
+                    REVALIDATIONS.hit()
+                else:
+                    REVALIDATIONS.miss()
+            if not_modified:
+                f.close()
+                self.send_response(304)
+                self._send_validators(etag, st.st_mtime, vary)
+                self.end_headers()
+                return None
+            size = st.st_size
+            if encoding is not None:
+                sidecar = None
+                if precompressed:
+                    sidecar = _precompressed_sibling(path, st, encoding)
+                if sidecar is None and self.compression is not None:
+                    sidecar = self.compression.sidecar(path, f, st, encoding, trailer)
+                body = None
+                if sidecar is not None:
+                    try:
+                        body = open(sidecar, "rb")
+                    except FileNotFoundError:
+                        # Another request rebuilt it for a newer source and
+                        # removed this one between the lookup and the open.
+                        pass
+                if body is None:
+                    # Cache dir unusable: fall back to the identity body.
+                    encoding = None
+                    etag = identity_etag
+                else:
+                    f.close()
+                    f = body
+                    size = os.fstat(f.fileno()).st_size
+                    trailer = b""
+            ranges = None
+            if "Range" in self.headers and size > 0 and not trailer:
+                if self._range_applies(etag, st.st_mtime):
+                    ranges = _parse_ranges(self.headers["Range"], size)
+            if ranges == []:
+                f.close()
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            if ranges is None:
+                self.send_response(200)
+                self.send_header("Content-type", ctype)
+                self._body_plan = [(0, size)]
+                length = size
+                if trailer:
+                    self._body_plan.append(trailer)
+                    length += len(trailer)
+            elif len(ranges) == 1:
+                start, end = ranges[0]
+                self.send_response(206)
+                self.send_header("Content-type", ctype)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self._body_plan = [(start, end - start + 1)]
+                length = end - start + 1
+            else:
+                boundary = secrets.token_hex(16)
+                self._body_plan = self._multipart_plan(ranges, size, ctype, boundary)
+                self.send_response(206)
+                self.send_header(
+                    "Content-type", f"multipart/byteranges; boundary={boundary}"
+                )
+                length = sum(
+                    len(part) if isinstance(part, bytes) else part[1]
+                    for part in self._body_plan
+                )
+            if encoding is not None:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(length))
+            if not trailer:
+                self.send_header("Accept-Ranges", "bytes")
+            self._send_validators(etag, st.st_mtime, vary)
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def _serve_events(self):
+        target = self._events_target()
+        if target is None or self.command == "HEAD":
+            return None
+        self.close_connection = True
+        events = self.watcher.subscribe(target)
+        try:
+            self.wfile.write(EVENTS_PREAMBLE)
+            while True:
+                try:
+                    version = events.get(timeout=EVENTS_KEEPALIVE)
+                except queue.Empty:
+                    self.wfile.write(EVENTS_KEEPALIVE_COMMENT)
+                    self._stream_bytes += len(EVENTS_KEEPALIVE_COMMENT)
+                    continue
+                message = event_message(version)
+                self.wfile.write(message)
+                self._stream_bytes += len(message)
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            self.watcher.unsubscribe(target, events)
+        return None
+
+    def _serve_stats(self, query: dict[str, list[str]]):
+        accept = self.headers.get("Accept", "")
+        fmt = query.get("format", [""])[0]
+        if fmt == "prometheus" or (not fmt and accept.startswith("text/plain")):
+            body = METRICS.prometheus().encode("utf-8")
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(METRICS.snapshot(), indent=2).encode("utf-8")
+            ctype = "application/json"
+        f = io.BytesIO(body)
+        self.send_response(200)
+        self.send_header("Content-type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return f
+
+    def _events_target(self) -> str | None:
+        """Validate an /__events request and send its headers.
+
+        Returns the watched file path, or None after sending an error.
+        """
+        query = parse_qs(urlparse(self.path).query)
+        url_path = unquote(query.get("path", [""])[0]).strip()
+        parts = self._parts_from_url_path(url_path)
+        if not parts or not self._is_allowed_parts(parts):
+            self.send_error(404, "Not found")
+            return None
+        target = os.path.join(self.directory, *parts)
+        if os.path.isdir(target):
+            target = os.path.join(target, "index.html")
+        self.send_response(200)
+        self.send_header("Content-type", "text/event-stream")
+        self.send_header("X-Accel-Buffering", "no")
+        self.end_headers()
+        return target
+
+    def _range_applies(self, etag: str, mtime: float) -> bool:
+        if_range = self.headers.get("If-Range")
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith(('"', "W/")):
+            # If-Range requires a strong match.
+            return if_range == etag
+        try:
+            since = email.utils.parsedate_to_datetime(if_range)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        return since.timestamp() == int(mtime)
+
+    def _multipart_plan(
+        self, ranges: list[tuple[int, int]], size: int, ctype: str, boundary: str
+    ) -> list[bytes | tuple[int, int]]:
+        plan: list[bytes | tuple[int, int]] = []
+        for start, end in ranges:
+            part_head = (
+                f"\r\n--{boundary}\r\n"
+                f"Content-Type: {ctype}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            )
+            plan.append(part_head.encode("latin-1"))
+            plan.append((start, end - start + 1))
+        plan.append(f"\r\n--{boundary}--\r\n".encode("latin-1"))
+        return plan
+
+    def copyfile(self, source, outputfile):
+        if self._body_plan is None:
+            return super().copyfile(source, outputfile)
+        for part in self._body_plan:
+            if isinstance(part, bytes):
+                outputfile.write(part)
+                continue
+            offset, count = part
+            if count == 0:
+                continue
+            outputfile.flush()
+            # socket.sendfile() uses os.sendfile() where the platform has it
+            # (zero-copy, constant memory) and falls back to send() otherwise.
+            self.connection.sendfile(source, offset, count)
+
+    def _negotiate_encoding(self) -> str | None:
+        accepted = _accepted_encodings(self.headers.get("Accept-Encoding", ""))
+        best = None
+        best_q = 0.0
+        for encoding in SIDECAR_SUFFIXES:
+            if encoding == "br" and brotli is None:
+                continue
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def _send_validators(self, etag: str, mtime: float, vary: bool = False) -> None:
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.date_time_string(mtime))
+        if vary:
+            self.send_header("Vary", "Accept-Encoding")
+
+    def _not_modified(self, etag: str, mtime: float) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # When both are present, If-None-Match wins (RFC 9110 13.2.2).
+            return _etag_matches(if_none_match, etag)
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        return int(mtime) <= since.timestamp()
+
     def list_directory(self, path):
         parts = self._rel_parts()
         if parts is None:
@@ -116,23 +905,17 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
         top = parts[0]
         if self._is_analysis_dir(top) and len(parts) == 1:
             return self._list_analysis_dir(top)
-        return super().list_directory(path)
+        return self._list_directory_page(path, parts)
 
     def _list_root(self):
-        root = Path(self.directory)
+        dirs = {e.name for e in LISTINGS.entries(self.directory) if e.is_dir}
         entries: list[tuple[str, str]] = []
         for name in ["project_journal", "figure_aggregator"]:
-            p = root / name
-            if p.is_dir():
+            if name in dirs:
                 entries.append((f"{name}/", f"{name}/"))
-        analysis = []
-        for name in sorted(os.listdir(root)):
-            p = root / name
-            if not p.is_dir():
-                continue
+        for name in sorted(dirs):
             if self._is_analysis_dir(name):
-                analysis.append((f"{name}/", f"{name}/"))
-        entries.extend(analysis)
+                entries.append((f"{name}/", f"{name}/"))
         return self._write_listing("/", entries)
 
     def _list_analysis_dir(self, name: str):
@@ -143,15 +926,73 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
             entries.append(("output/", f"/{name}/output/"))
         return self._write_listing(f"/{name}/", entries)
 
+    def _list_directory_page(self, path: str, parts: list[str]):
+        try:
+            entries = LISTINGS.entries(path)
+        except OSError:
+            return self.send_error(404, "No permission to list directory")
+        query = parse_qs(urlparse(self.path).query)
+        sort = query.get("sort", ["name"])[0]
+        if sort not in LISTING_SORT_KEYS:
+            sort = "name"
+        order = "desc" if query.get("order", ["asc"])[0] == "desc" else "asc"
+        per_page = min(
+            max(1, _query_int(query, "per_page", LISTING_PAGE_SIZE)),
+            LISTING_MAX_PAGE_SIZE,
+        )
+        n_pages = max(1, -(-len(entries) // per_page))
+        page = min(max(1, _query_int(query, "page", 1)), n_pages)
+
+        if sort == "name":
+            entries.sort(key=lambda e: e.name.lower(), reverse=order == "desc")
+        else:
+            entries.sort(key=lambda e: getattr(e, sort), reverse=order == "desc")
+        # Directories stay on top whatever the sort order.
+        entries.sort(key=lambda e: not e.is_dir)
+        shown = entries[(page - 1) * per_page : page * per_page]
+
+        display_path = "/" + "/".join(parts) + "/"
+
+        def link(**changes) -> str:
+            params = {"sort": sort, "order": order, "page": page, "per_page": per_page}
+            params.update(changes)
+            return "?" + urlencode(params)
+
+        header_cells = []
+        for key, label in (("name", "Name"), ("size", "Size"), ("mtime", "Modified")):
+            next_order = "desc" if key == sort and order == "asc" else "asc"
+            marker = (" &#9650;" if order == "asc" else " &#9660;") if key == sort else ""
+            header_cells.append(
+                f"<th><a href='{html.escape(link(sort=key, order=next_order, page=1))}'>"
+                f"{label}</a>{marker}</th>"
+            )
+        rows = [
+            "<table>",
+            "<tr>" + "".join(header_cells) + "</tr>",
+            "<tr><td><a href='../'>../</a></td><td></td><td></td></tr>",
+        ]
+        for entry in shown:
+            name = entry.name + ("/" if entry.is_dir else "")
+            href = quote(name, errors="surrogatepass")
+            size = "" if entry.is_dir else _format_size(entry.size)
+            modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime))
+            rows.append(
+                f"<tr><td><a href='{html.escape(href)}'>{html.escape(name)}</a></td>"
+                f"<td>{size}</td><td>{modified}</td></tr>"
+            )
+        rows.append("</table>")
+        if n_pages > 1:
+            nav = [f"Page {page} of {n_pages} ({len(entries)} entries)"]
+            if page > 1:
+                nav.insert(0, f"<a href='{html.escape(link(page=page - 1))}'>&laquo; prev</a>")
+            if page < n_pages:
+                nav.append(f"<a href='{html.escape(link(page=page + 1))}'>next &raquo;</a>")
+            rows.append("<p>" + " | ".join(nav) + "</p>")
+        return self._send_listing_html(f"Index of {display_path}", rows)
+
     def _write_listing(self, display_path: str, entries: list[tuple[str, str]]):
         title = f"Index of {display_path}"
         lines = [
-            "<!DOCTYPE html>",
-            "<html><head>",
-            "<meta charset='utf-8'>",
-            f"<title>{html.escape(title)}</title>",
-            "</head><body>",
-            f"<h1>{html.escape(title)}</h1>",
             "<ul>",
             "<li><a href='/'>/</a></li>" if display_path != "/" else "",
         ]
@@ -163,7 +1004,21 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
                     f"<li><a href='{html.escape(href)}'>"
                     f"{html.escape(display_name)}</a></li>"
                 )
-        lines.extend(["</ul>", "</body></html>"])
+        lines.append("</ul>")
+        return self._send_listing_html(title, lines)
+
+    def _send_listing_html(self, title: str, body_lines: list[str]):
+        lines = [
+            "<!DOCTYPE html>",
+            "<html><head>",
+            "<meta charset='utf-8'>",
+            f"<title>{html.escape(title)}</title>",
+            "<style>td, th { padding: 0.1rem 1rem 0.1rem 0; text-align: left; }</style>",
+            "</head><body>",
+            f"<h1>{html.escape(title)}</h1>",
+            *body_lines,
+            "</body></html>",
+        ]
         encoded = "\n".join(line for line in lines if line).encode(
             "utf-8", "surrogateescape"
         )
@@ -198,6 +1053,14 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
 
         safe_title = html.escape(file_path)
         js_file_path = json.dumps(file_path)
+        # Prefer the vendored copy (works offline, cached forever); fall back
+        # to the CDN when local_server/fetch_static.py has not been run.
+        pdfjs_url = STATIC_ASSETS.url(f"pdfjs/{PDFJS_VERSION}/pdf.min.js")
+        worker_url = STATIC_ASSETS.url(f"pdfjs/{PDFJS_VERSION}/pdf.worker.min.js")
+        if pdfjs_url is None or worker_url is None:
+            pdfjs_url = PDFJS_CDN + "pdf.min.js"
+            worker_url = PDFJS_CDN + "pdf.worker.min.js"
+        js_worker_url = json.dumps(worker_url)
         html_doc = f"""<!DOCTYPE html>
 <html>
 <head>
@@ -343,7 +1206,7 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
   </div>
   <div id="error" class="error" hidden></div>
 
-  <script src="https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.min.js"></script>
+  <script src="{html.escape(pdfjs_url)}"></script>
   <script>
     const filePath = {js_file_path};
     const rawPdfUrl = filePath + (filePath.includes("?") ? "&" : "?") + "raw=1";
@@ -499,11 +1362,13 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
 
     async function loadPdf(forceReload = false) {{
       if (!window.pdfjsLib) {{
-        showError("pdf.js failed to load. Check internet access for CDN assets.");
+        showError(
+          "pdf.js failed to load. Run local_server/fetch_static.py to vendor it, " +
+          "or check internet access for CDN assets."
+        );
         return;
       }}
-      window.pdfjsLib.GlobalWorkerOptions.workerSrc =
-        "https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.worker.min.js";
+      window.pdfjsLib.GlobalWorkerOptions.workerSrc = {js_worker_url};
 
       const version = await fetchVersion();
       if (!forceReload && pdf && version && version === lastVersion) {{
@@ -568,9 +1433,25 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
       }}
     }});
 
-    setInterval(() => {{
-      loadPdf(false);
-    }}, 2000);
+    if (window.EventSource) {{
+      const events = new EventSource(
+        "{EVENTS_PATH}?" + new URLSearchParams({{ path: filePath }})
+      );
+      let subscribed = false;
+      events.addEventListener("change", () => {{
+        // The event sent on subscribe only reports the current version,
+        // which the startup loadPdf(true) below already covers.
+        if (!subscribed) {{
+          subscribed = true;
+          return;
+        }}
+        loadPdf(false);
+      }});
+    }} else {{
+      setInterval(() => {{
+        loadPdf(false);
+      }}, 2000);
+    }}
 
     window.addEventListener("beforeunload", saveState);
     textLayer.addEventListener("mousedown", () => {{
@@ -599,6 +1480,37 @@ class FilteredHTTPRequestHandler(SimpleHTTPRequestHandler):
 def main() -> None:
     parser = argparse.ArgumentParser(description="Serve static files from a directory.")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind")
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_COMPRESS_CACHE_DIR,
+        help="Where compressed .gz/.br copies of served files are kept",
+    )
+    parser.add_argument(
+        "--no-compress",
+        action="store_true",
+        help="Always send files uncompressed",
+    )
+    parser.add_argument(
+        "--live-reload",
+        action="store_true",
+        help="Inject an auto-reload snippet into served HTML pages (each open "
+        "page keeps one /__events connection; browsers allow 6 per host)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threading", "asyncio"],
+        default="threading",
+        help="threading: one OS thread per connection; asyncio: one event "
+        "loop plus a bounded worker pool (better for many idle/keep-alive "
+        "clients)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Worker threads for request handling with --engine asyncio",
+    )
     args = parser.parse_args()
 
     host = "127.0.0.1"
@@ -608,9 +1520,18 @@ def main() -> None:
 
     handler = FilteredHTTPRequestHandler
     handler.directory = str(root)
+    handler.live_reload = args.live_reload
+    if not args.no_compress:
+        handler.compression = CompressionCache(args.cache_dir.expanduser().resolve())
+        METRICS.register_cache("compression", handler.compression.stats.counts)
 
-    server = ThreadingHTTPServer((host, args.port), handler)
-    print(f"Serving {root} on http://{host}:{args.port}")
+    if args.engine == "asyncio":
+        from async_engine import serve
+
+        server = None
+    else:
+        server = ThreadingHTTPServer((host, args.port), handler)
+    print(f"Serving {root} on http://{host}:{args.port} ({args.engine} engine)")
 
     local_port = args.port
     ssh_user = getpass.getuser()
@@ -628,7 +1549,10 @@ def main() -> None:
     )
     print(f"Then open: http://127.0.0.1:{local_port}")
     try:
-        server.serve_forever()
+        if server is None:
+            serve(handler, host, args.port, workers=args.workers)
+        else:
+            server.serve_forever()
     except KeyboardInterrupt:
         pass
 
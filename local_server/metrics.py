@@ -0,0 +1,189 @@
+"""Request metrics for html_server.py, exposed at /__stats.
+
+Everything is plain counters updated under one lock: a request costs a
+couple of dict lookups and a bisect, so this stays on all the time.
+Latency is kept as a fixed-bucket histogram per route, and percentiles are
+estimated by interpolating inside the bucket that holds them.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+import threading
+import time
+from typing import Callable
+
+# Upper bounds in milliseconds; the last bucket catches everything else.
+LATENCY_BUCKETS_MS = (
+    1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, float("inf")
+)
+PERCENTILES = (0.50, 0.95, 0.99)
+
+
+class HitCounter:
+    """Hit/miss tally owned by a cache; unlocked, so counts are approximate."""
+
+    __slots__ = ("hits", "misses")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self) -> None:
+        self.hits += 1
+
+    def miss(self) -> None:
+        self.misses += 1
+
+    def counts(self) -> tuple[int, int]:
+        return self.hits, self.misses
+
+
+class _RouteStats:
+    __slots__ = ("count", "bytes_sent", "statuses", "buckets", "total_ms")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.bytes_sent = 0
+        self.statuses: dict[int, int] = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.total_ms = 0.0
+
+    def percentile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            if n and seen + n >= rank:
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = upper
+        return lower
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._routes: dict[str, _RouteStats] = {}
+        self.started = time.time()
+        self.active_connections = 0
+        self.in_flight = 0
+        # name -> callable returning (hits, misses); polled only on /__stats.
+        self._caches: dict[str, Callable[[], tuple[int, int]]] = {}
+
+    def register_cache(self, name: str, counts: Callable[[], tuple[int, int]]) -> None:
+        self._caches[name] = counts
+
+    def connection_opened(self) -> None:
+        with self._lock:
+            self.active_connections += 1
+
+    def connection_closed(self) -> None:
+        with self._lock:
+            self.active_connections -= 1
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(
+        self, route: str, status: int, bytes_sent: int, elapsed_s: float
+    ) -> None:
+        elapsed_ms = elapsed_s * 1000.0
+        bucket = bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            self.in_flight -= 1
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = _RouteStats()
+            stats.count += 1
+            stats.bytes_sent += bytes_sent
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.buckets[bucket] += 1
+            stats.total_ms += elapsed_ms
+
+    def snapshot(self) -> dict:
+        caches = {}
+        for name, counts in self._caches.items():
+            hits, misses = counts()
+            total = hits + misses
+            caches[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / total, 4) if total else None,
+            }
+        with self._lock:
+            routes = {}
+            for route, stats in sorted(self._routes.items()):
+                routes[route] = {
+                    "requests": stats.count,
+                    "bytes_sent": stats.bytes_sent,
+                    "statuses": {str(k): v for k, v in sorted(stats.statuses.items())},
+                    "latency_ms": {
+                        f"p{int(q * 100)}": round(stats.percentile(q), 3)
+                        for q in PERCENTILES
+                    },
+                    "latency_ms_sum": round(stats.total_ms, 3),
+                    "latency_buckets": list(stats.buckets),
+                }
+            return {
+                "uptime_s": round(time.time() - self.started, 3),
+                "active_connections": self.active_connections,
+                "in_flight_requests": self.in_flight,
+                "routes": routes,
+                "caches": caches,
+            }
+
+    def prometheus(self) -> str:
+        snap = self.snapshot()
+        lines = [
+            "# TYPE html_server_uptime_seconds gauge",
+            f"html_server_uptime_seconds {snap['uptime_s']}",
+            "# TYPE html_server_active_connections gauge",
+            f"html_server_active_connections {snap['active_connections']}",
+            "# TYPE html_server_in_flight_requests gauge",
+            f"html_server_in_flight_requests {snap['in_flight_requests']}",
+            "# TYPE html_server_requests_total counter",
+        ]
+        for route, stats in snap["routes"].items():
+            for status, n in stats["statuses"].items():
+                lines.append(
+                    f'html_server_requests_total{{route="{route}",status="{status}"}} {n}'
+                )
+        lines.append("# TYPE html_server_bytes_sent_total counter")
+        for route, stats in snap["routes"].items():
+            lines.append(
+                f'html_server_bytes_sent_total{{route="{route}"}} {stats["bytes_sent"]}'
+            )
+        lines.append("# TYPE html_server_request_duration_seconds histogram")
+        for route, stats in snap["routes"].items():
+            cumulative = 0
+            for upper, n in zip(LATENCY_BUCKETS_MS, stats["latency_buckets"]):
+                cumulative += n
+                le = "+Inf" if upper == float("inf") else f"{upper / 1000:g}"
+                lines.append(
+                    "html_server_request_duration_seconds_bucket"
+                    f'{{route="{route}",le="{le}"}} {cumulative}'
+                )
+            lines.append(
+                f'html_server_request_duration_seconds_sum{{route="{route}"}} '
+                f"{stats['latency_ms_sum'] / 1000:g}"
+            )
+            lines.append(
+                f'html_server_request_duration_seconds_count{{route="{route}"}} '
+                f"{stats['requests']}"
+            )
+        lines.append("# TYPE html_server_cache_lookups_total counter")
+        for name, cache in snap["caches"].items():
+            for outcome, key in (("hit", "hits"), ("miss", "misses")):
+                lines.append(
+                    f'html_server_cache_lookups_total{{cache="{name}",'
+                    f'outcome="{outcome}"}} {cache[key]}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()